@@ -1,21 +1,31 @@
 from dotenv import load_dotenv
-from openai import OpenAI
+import argparse
+import asyncio
+import hashlib
 import json
 import os
-import threading
 import time
-import sys
+import functools
+import re
+
+import context_budget
+import doc_validation
+import docs_context
+import llm_backends
+import llm_cache
+import llm_stream
+import model_cascade
+import prompt_layout
+import stream_validator
+import retrieval_index
+import tracing
 
 load_dotenv()
 
 def prompt():
-    return """Eres un generador de contenido documental para un proyecto, `dado un template + valores => Actualizas al documento`
-## Usando el template y estos valores:
+    return """## Usando el template y estos valores:
 Nombre Proyecto: {project_name}
 Repositorio: {repository}
-```json
-{package}
-```
 
 # Usando esta codigo, estructura y template:
 ```
@@ -24,119 +34,291 @@ Repositorio: {repository}
 ### Actualiza el documento Arquitectura.md haciendolo más detallado para los ejemplos
 """
 
-event = False
+def section_prompt():
+    return """## Usando el template y estos valores:
+Nombre Proyecto: {project_name}
+Repositorio: {repository}
 
-def llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo):
-    global event
-    client = OpenAI(
-        base_url = "https://api.groq.com/openai/v1", 
-        api_key=os.environ.get("GROQ_API_KEY"),  # This is the default and can be omitted
-    )
+# Usando esta codigo, estructura y esta sección del template:
+```
+{template}
+```
+### Actualiza únicamente esta sección del documento Arquitectura.md haciéndola más detallada para los ejemplos.
+Conserva su encabezado y responde solo con el contenido de la sección.
+"""
+
+# Backend definido en llm_backends.py (se puede cambiar con DOCS_LLM_BACKEND)
+BACKEND = "groq"
+MAX_TOKENS = 8000
+SECTION_MAX_TOKENS = 3000
+DEFAULT_CONCURRENCY = 4
+# Mapa de dependencias de cada sección generada: rutas de origen con su
+# hash y el contenido generado, para regenerar solo lo que cambió
+SECTIONS_PATH = './.arquitectura_sections.json'
+REPOSITORY_URL = 'git@github.com:Cencosud-xlabs/shopping-app.git'  # Puedes ajustar esto si es necesario
+
+# Secciones "### **2.x. `<capa>/`**" del Template.md; los encabezados '#' y
+# '##' (p.ej. un capítulo después de la última capa) también abren sección
+SECTION_HEADING = re.compile(r'(?m)^(?:### \*\*2\.\d+\. .*|#{1,2} .*)$')
+SECTION_LAYER = re.compile(r'`([^`]+)/`')
+INLINE_CODE = re.compile(r'`([^`\n]+)`')
+
+def build_messages(template, project_name, repository_url, package_json, directory_tree, repo, model):
+    """Arma los mensajes de la solicitud completa, ajustados a la ventana de contexto de 'model'."""
     prompt_value = prompt().format(
         template=template, 
         project_name=project_name, 
         repository=repository_url, 
-        package=package_json, 
     )
+    return prompt_layout.build_messages(model, prompt_value, directory_tree, repo, package_json, MAX_TOKENS)
 
-    print("Procesando... Esto puede tomar unos segundos:")  # Mensaje inicial
-    start_time = time.time()  # Inicia el contador de tiempo
-
-    # Función para mostrar logs periódicos
-    def log_progress():
-        while not event.is_set():
-            elapsed_time = time.time() - start_time
-            print(f"Procesando: {int(elapsed_time)}s...")
-            time.sleep(1)
-
-    # Evento para detener los logs
-    # event = threading.Event()
-    # log_thread = threading.Thread(target=log_progress)
-    # log_thread.start()
-
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": f"""### CodeBase
---- directory_tree ---
-```
-{directory_tree}
-```
---- code ---
-{repo}
---- /code ---
-### Use Codebase to update the document
-----"""
-            },
-            {
-                "role": "user",
-                "content": prompt_value,
-            }
-        ],
-        model="qwen-2.5-coder-32b",
-        # model="gpt4-o",
-        max_tokens=8000
-    )
 
-    print(chat_completion)
+def llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo, output_path=None, stream=False,
+                      cascade=False):
+    client = llm_backends.get_client(BACKEND)
+    backend = llm_backends.get_backend(BACKEND)
+    model = backend.model
+    messages = build_messages(template, project_name, repository_url, package_json, directory_tree, repo, model)
 
-    return chat_completion.choices[0].message.content
-    
+    print("Procesando... Esto puede tomar unos segundos:")  # Mensaje inicial
 
+    if cascade:
+        # El borrador se valida completo antes de aceptarlo, por eso sin streaming
+        return model_cascade.cascade_completion(
+            client, messages, backend, MAX_TOKENS, doc_validation.validator(template, directory_tree, repo),
+            'Arquitectura.md',
+        )
+    if stream:
+        # Se corta al completar el template y se reintenta solo la sección que se desvía
+        completion = functools.partial(
+            stream_validator.validated_stream_completion, output_path=output_path, template=template
+        )
+    else:
+        completion = llm_cache.cached_completion
+    content = completion(
+        client,
+        messages=messages,
+        model=model,
+        max_tokens=MAX_TOKENS
+    )
 
-def generate_guide():
-    package_json = ""
-    with open('../package.json', 'r', encoding='utf-8') as f:
-        package_json = f.read()
-        package = json.loads(package_json)  # Parse the raw string into a JSON object if needed
+    return content
+
+
+def split_template_sections(template):
+    """
+    Divide Template.md en secciones por cada encabezado '### **2.x. ...**'
+    y por los de nivel 1 y 2, para que lo que sigue a la última capa no se
+    genere junto con ella (con el límite de tokens de una sección).
+    Devuelve una lista de (capa, texto) en orden; el preámbulo y las
+    secciones que no corresponden a una carpeta tienen capa None.
+    """
+    # Un '# comentario' dentro de un bloque de código no es un encabezado
+    starts = [
+        match.start() for match in SECTION_HEADING.finditer(template)
+        if doc_validation.fences_balanced(template[:match.start()])
+    ]
+    bounds = [0] + starts + [len(template)]
+    sections = []
+    for start, end in zip(bounds, bounds[1:]):
+        text = template[start:end]
+        if not text.strip():
+            continue
+        layer = SECTION_LAYER.search(text.split('\n', 1)[0]) if start in starts else None
+        sections.append((layer.group(1) if layer else None, text))
+    return sections
+
+
+def layer_code(repo, layer):
+    # Solo los archivos de repo.md que viven dentro de la carpeta de la capa
+    if layer is None:
+        return ''
+    fragments = context_budget.split_fragments(repo)
+    return '\n'.join(
+        fragment.rstrip('\n') + '\n'
+        for fragment in fragments
+        if layer in context_budget.fragment_path(fragment).replace('\\', '/').split('/')
+    )
 
-    project_name = package.get('name', 'Nombre del Proyecto')
-    project_version = package.get('version', '1.0.0')
-    project_description = package.get('description', '')
-    repository_url = 'git@github.com:Cencosud-xlabs/shopping-app.git'  # Puedes ajustar esto si es necesario
 
-    directory_tree = generate_directory_tree()
+def section_query(section):
+    # El título de la sección y las rutas o nombres citados en ella (`domain/ports`, `App.tsx`, ...)
+    heading = section.strip().split('\n', 1)[0]
+    return ' '.join([heading] + INLINE_CODE.findall(section))
+
+
+def section_code(repo, layer, section, index=None):
+    """Código para una sección: el de su capa o, con índice BM25, los archivos más relevantes."""
+    if index is None:
+        return layer_code(repo, layer)
+    return retrieval_index.relevant_code(repo, section_query(section), index)
+
+
+def load_sections(sections_path=SECTIONS_PATH):
+    try:
+        with open(sections_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('sections', {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_sections(sections, sections_path=SECTIONS_PATH):
+    tmp_path = sections_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'sections': sections}, f, ensure_ascii=False)
+    os.replace(tmp_path, sections_path)
+
+
+def section_key(prompt_value, model):
+    # Identifica la sección por su prompt (texto del template, proyecto) y el modelo
+    return hashlib.sha256(json.dumps([prompt_value, model, SECTION_MAX_TOKENS]).encode('utf-8')).hexdigest()
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def section_inputs(code, directory_tree='', package_json=None):
+    """
+    Rutas de origen de la sección con el hash de su fragmento en repo.md,
+    más el árbol y el package.json, que también van en el prompt (las
+    secciones sin capa solo dependen de ellos).
+    """
+    inputs = {
+        context_budget.fragment_path(fragment): _sha256(fragment)
+        for fragment in context_budget.split_fragments(code)
+    }
+    inputs['<directory_tree>'] = _sha256(directory_tree)
+    if package_json is not None:
+        inputs['<package.json>'] = _sha256(package_json)
+    return inputs
+
+
+async def llm_section_content(client, semaphore, layer, section, project_name, repository_url, directory_tree, repo,
+                              index=None, previous=None, dependencies=None, package_json=None, cascade=False):
+    """
+    Genera una sección. Si 'previous' (mapa de dependencias de la ejecución
+    anterior) tiene la misma sección con las mismas rutas y hashes de
+    origen (incluidos el árbol y el package.json), se reutiliza su contenido sin llamar al LLM. La entrada
+    resultante se agrega a 'dependencies'. Con 'cascade' solo las
+    secciones cuyo borrador no pasa la validación van al modelo grande.
+    """
+    title = layer or section.split('\n', 1)[0].strip('# *')
+    backend = llm_backends.get_backend(BACKEND)
+    model = backend.model
+    prompt_value = section_prompt().format(
+        template=section,
+        project_name=project_name,
+        repository=repository_url,
+    )
+    code = section_code(repo, layer, section, index)
+    key = section_key(prompt_value, model)
+    inputs = section_inputs(code, directory_tree, package_json)
+    entry = (previous or {}).get(key)
+    if entry and entry['inputs'] == inputs:
+        print(f"Sección {title}: sin cambios")
+        if dependencies is not None:
+            dependencies[key] = dict(entry, reused=True)
+        return entry['content']
+
+    messages = prompt_layout.build_messages(model, prompt_value, directory_tree, code, package_json, SECTION_MAX_TOKENS)
+    queued_at = time.perf_counter()
+    if cascade:
+        # La cascada toma el semáforo en cada solicitud (borrador y escalada)
+        start_time = queued_at
+        content = await model_cascade.cascade_completion_async(
+            client, messages, backend, SECTION_MAX_TOKENS, doc_validation.validator(section, directory_tree, repo),
+            f"Sección {title}", semaphore,
+        )
+    else:
+        async with semaphore:
+            start_time = time.perf_counter()
+            tracing.record('queue', queued_at, start_time, section=title)
+            content = await llm_cache.cached_completion_async(
+                client,
+                messages=messages,
+                model=model,
+                max_tokens=SECTION_MAX_TOKENS
+            )
+    print(f"Sección {title}: {time.perf_counter() - start_time:.1f}s")
+    if dependencies is not None:
+        dependencies[key] = {'title': title, 'inputs': inputs, 'content': content, 'reused': False}
+    return content
+
+
+async def llm_guide_content_map_reduce(template, project_name, repository_url, directory_tree, repo, concurrency=DEFAULT_CONCURRENCY,
+                                       retrieval=False, incremental=False, semaphore=None, sections_path=SECTIONS_PATH,
+                                       index_path=retrieval_index.INDEX_PATH, package_json=None, cascade=False):
+    """
+    Genera cada sección del template en paralelo (map) usando solo el
+    código de su capa, y luego las une en el orden original (reduce).
+    Con 'retrieval' cada sección recibe los archivos que el índice BM25
+    considera más relevantes para su título. Con 'incremental' solo se
+    regeneran las secciones cuyo código de origen cambió; el resto se
+    toma de la ejecución anterior (SECTIONS_PATH).
+
+    'semaphore' permite compartir el límite de solicitudes en vuelo con
+    otras generaciones (ver docs_batch.py); por defecto se crea uno con
+    'concurrency'.
+    """
+    client = llm_backends.get_async_client(BACKEND)
+    index = retrieval_index.get_index(repo, index_path) if retrieval else None
+    shared = semaphore is not None
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    sections = split_template_sections(template)
+    previous = load_sections(sections_path) if incremental else None
+    dependencies = {}
+    print(f"Generando {len(sections)} secciones" + ("..." if shared else f" con concurrencia {concurrency}..."))
+    results = await asyncio.gather(*(
+        llm_section_content(
+            client, semaphore, layer, section, project_name, repository_url, directory_tree, repo, index,
+            previous, dependencies, package_json, cascade,
+        )
+        for layer, section in sections
+    ))
+    regenerated = [entry['title'] for entry in dependencies.values() if not entry.pop('reused')]
+    if incremental:
+        print(f"Secciones regeneradas: {len(regenerated)} de {len(sections)} {regenerated}")
+    # Se guarda siempre, para que la próxima ejecución incremental tenga con qué comparar
+    save_sections(dependencies, sections_path)
+    return '\n\n'.join(result.strip('\n') for result in results) + '\n'
+
+
+
+def generate_guide(stream=False, map_reduce=False, concurrency=DEFAULT_CONCURRENCY, context=None, retrieval=False,
+                   incremental=False, cascade=False):
+    # El contexto (package.json, árbol y repo.md) puede venir ya cargado desde build_docs.py
+    context = context or docs_context.load_context()
+    package_json = context['package_json']
+
+    project_name = context['project_name']
+    project_version = context['project_version']
+    project_description = context['project_description']
+    repository_url = REPOSITORY_URL
+
+    directory_tree = context['directory_tree']
     with open('./Template.md', 'r', encoding='utf-8') as f:
         template = f.read()
-    with open('./repo.md', 'r', encoding='utf-8') as f:
-        repo = f.read()
+    repo = context['repo']
     # template = generate_template(project_name, project_version, repository_url, directory_tree)
 
-    with open('./Arquitectura.md', 'w', encoding='utf-8') as f:
-        chat_completion = llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo)
-        f.write(chat_completion)
-    # event.set()
-
-
-
-def generate_directory_tree():
-    # Ignorar ciertas carpetas
-    ignore_dirs = {'.git', 'node_modules', '__pycache__', 'android', 'ios', 'fonts'}
-    structure = []
-
-    start_path = '../'
-    base_level = start_path.rstrip(os.sep).count(os.sep)
-
-    for root, dirs, files in os.walk(start_path):
-        # Filtrar directorios ignorados
-        dirs[:] = [d for d in dirs if d not in ignore_dirs and not d.startswith('.')]
-        
-        current_level = root.rstrip(os.sep).count(os.sep) - base_level
-        if current_level >= 4:
-            # No descender más allá del segundo nivel
-            dirs[:] = []
-            continue
-
-        indent = '    ' * current_level
-        folder = os.path.basename(root)
-        structure.append(f"{indent}├── {folder}/")
+    output_path = './Arquitectura.md'
+    # La regeneración incremental trabaja por secciones
+    if map_reduce or incremental:
+        chat_completion = llm_backends.run(llm_guide_content_map_reduce(
+            template, project_name, repository_url, directory_tree, repo, concurrency, retrieval, incremental,
+            package_json=package_json, cascade=cascade,
+        ))
+        llm_stream.write_atomic(output_path, chat_completion)
+        return output_path
+    chat_completion = llm_guide_content(
+        template, project_name, repository_url, package_json, directory_tree, repo, output_path, stream, cascade
+    )
+    if not stream or cascade:
+        llm_stream.write_atomic(output_path, chat_completion)
+    return output_path
 
-        subindent = '    ' * (current_level + 1)
-        for f in files:
-            structure.append(f"{subindent}├── {f}")
 
-    return '\n'.join(structure)
 
 def generate_template(project_name, project_version, repository_url, directory_tree):
     template = f"""# Guía de Contribución y Arquitectura del Proyecto
@@ -300,4 +482,19 @@ Si tienes preguntas, problemas o sugerencias, por favor abre un Issue en el repo
     return template
 
 if __name__ == '__main__':
-    generate_guide()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Genera Arquitectura.md a partir de Template.md')
+    llm_cache.add_arguments(parser)
+    llm_stream.add_arguments(parser)
+    parser.add_argument('--map-reduce', action='store_true', help='Genera cada sección del template en paralelo')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Secciones generadas en paralelo')
+    parser.add_argument('--retrieval', action='store_true', help='Con --map-reduce, elige el código de cada sección con BM25')
+    parser.add_argument('--incremental', action='store_true', help='Regenera solo las secciones cuyo código cambió (implica --map-reduce)')
+    model_cascade.add_arguments(parser)
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    if not llm_cache.apply_arguments(args):
+        generate_guide(
+            stream=args.stream, map_reduce=args.map_reduce, concurrency=args.concurrency,
+            retrieval=args.retrieval, incremental=args.incremental, cascade=args.cascade,
+        )
+        tracing.finish(args.trace)
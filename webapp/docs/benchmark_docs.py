@@ -0,0 +1,283 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import arquitecture_generator
+import ignore_rules
+import llm_backends
+import llm_cache
+import llm_retry
+import repo_scanner
+import repo_to_markdown
+
+# Benchmarks del pipeline de documentación sobre repositorios TS/TSX
+# sintéticos. Mide cada etapa (recorrido, lectura, árbol, armado del prompt
+# y una ida y vuelta contra el backend 'mock') y el pico de memoria, y
+# guarda los resultados en JSON para compararlos entre commits:
+#
+#   python benchmark_docs.py --sizes 1000 10000 --output bench-antes.json
+#   python benchmark_docs.py --sizes 1000 10000 --compare bench-antes.json
+#
+# Cada tamaño se mide en un proceso aparte para que el pico de RSS no se
+# mezcle entre tamaños. Los repositorios generados se reutilizan entre
+# ejecuciones (se guardan en --workdir).
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'docs-bench-repos')
+RESULTS_VERSION = 1
+STAGES = ('walk', 'walk_incremental', 'render', 'read', 'prompt', 'llm')
+
+LAYERS = ('domain', 'application', 'infrastructure', 'providers', 'presentation', 'routes', 'hooks', 'theme')
+OTHER_FILES = (('.json', '{\n  "key": "value"\n}\n'), ('.css', '.item {\n  color: red;\n}\n'), ('.md', '# Notas\n'))
+# Fracción de archivos que no son TS/TSX y de archivos más grandes que MAX_FILE_BYTES
+OTHER_RATE = 0.1
+LARGE_RATE = 0.002
+
+
+def synthetic_source(rng, name, size, imports):
+    lines = [f"import {{ {other} }} from '../{other}';" for other in imports]
+    lines.append('')
+    length = sum(len(line) + 1 for line in lines)
+    i = 0
+    while length < size:
+        block = '\n'.join([
+            f"export interface {name}Props{i} {{",
+            "  id: string;",
+            f"  value{i}: number;",
+            "}",
+            f"export function {name}{i}(props: {name}Props{i}): number {{",
+            f"  // cálculo {rng.randrange(10 ** 6)}",
+            f"  return props.value{i} * {rng.randrange(1000)};",
+            "}",
+            '',
+        ])
+        lines.append(block)
+        length += len(block) + 1
+        i += 1
+    return '\n'.join(lines)
+
+
+def generate_repo(root, files, seed=0):
+    """
+    Genera en 'root' un repositorio con 'files' archivos repartidos en capas
+    con profundidad variable (1 a 6 niveles) y tamaños de ~200 B a ~60 KB,
+    más algunos archivos no TS y algunos que superan MAX_FILE_BYTES.
+    """
+    marker = os.path.join(root, '.bench-complete')
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == {'files': files, 'seed': seed}:
+                return
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'package.json'), 'w', encoding='utf-8') as f:
+        json.dump({'name': f'bench-{files}', 'version': '0.0.0', 'description': 'Repositorio sintético'}, f)
+    with open(os.path.join(root, '.gitignore'), 'w', encoding='utf-8') as f:
+        f.write('/dist/\n')
+
+    directories = []
+    names = []
+    for i in range(files):
+        if not directories or rng.random() < 0.05:
+            depth = rng.randint(1, 6)
+            parts = [rng.choice(LAYERS)] + [f"mod{rng.randrange(50)}" for _ in range(depth - 1)]
+            directories.append(os.path.join(root, 'src', *parts))
+            os.makedirs(directories[-1], exist_ok=True)
+        directory = rng.choice(directories[-20:])
+        name = f"File{i}"
+        roll = rng.random()
+        if roll < OTHER_RATE:
+            ext, content = rng.choice(OTHER_FILES)
+            path = os.path.join(directory, f"file{i}{ext}")
+        else:
+            if roll < OTHER_RATE + LARGE_RATE:
+                size = 2 * ignore_rules.MAX_FILE_BYTES
+            else:
+                size = min(int(rng.lognormvariate(8, 1)), 60 * 1024)
+            imports = rng.sample(names[-200:], min(len(names), rng.randint(0, 5)))
+            path = os.path.join(directory, f"{name}{'.tsx' if rng.random() < 0.4 else '.ts'}")
+            content = synthetic_source(rng, name, size, imports)
+            names.append(name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump({'files': files, 'seed': seed}, f)
+
+
+def peak_rss():
+    """Pico de memoria residente del proceso en bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB y macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start_time)
+    return result, {'median': statistics.median(times), 'min': min(times)}
+
+
+def run_stages(root, repeat, workers):
+    """Mide todas las etapas sobre el repositorio 'root' en este proceso."""
+    stages = {}
+    rss = {}
+    key = os.path.abspath(root)
+
+    def walk():
+        repo_scanner._indexes.pop(key, None)
+        return repo_scanner.get_index(root, index_path=None)
+    index, stages['walk'] = measure(walk, repeat)
+    rss['walk'] = peak_rss()
+    _, stages['walk_incremental'] = measure(lambda: repo_scanner.get_index(root, index_path=None, refresh=True), repeat)
+    rss['walk_incremental'] = peak_rss()
+
+    tree, stages['render'] = measure(lambda: repo_scanner.render_tree(index), repeat)
+    rss['render'] = peak_rss()
+
+    # Con la raíz ya indexada, la lectura reutiliza el índice en memoria
+    repo, stages['read'] = measure(lambda: repo_to_markdown.generar_markdown_ts_tsx([root], workers=workers), repeat)
+    rss['read'] = peak_rss()
+
+    with open('./Template.md', 'r', encoding='utf-8') as f:
+        template = f.read()
+    with open(os.path.join(root, 'package.json'), 'r', encoding='utf-8') as f:
+        package_json = f.read()
+    model = llm_backends.get_backend(arquitecture_generator.BACKEND).model
+    messages, stages['prompt'] = measure(lambda: arquitecture_generator.build_messages(
+        template, 'bench', 'https://example.com/bench.git', package_json, tree, repo, model
+    ), repeat)
+    rss['prompt'] = peak_rss()
+
+    client = llm_backends.get_client('mock')
+    request = llm_cache.request_kwargs(messages, 'mock-model', arquitecture_generator.MAX_TOKENS)
+    _, stages['llm'] = measure(lambda: llm_retry.create(client.chat.completions.create, **request), repeat)
+    rss['llm'] = peak_rss()
+
+    return {
+        'files': sum(1 for entry in repo_scanner.iter_entries(index) if entry.type == 'file'),
+        'ts_files': sum(1 for _ in repo_scanner.iter_files(root, repo_to_markdown.EXTENSIONES, root=root)),
+        'repo_md_bytes': len(repo.encode('utf-8')),
+        'prompt_chars': sum(len(message['content']) for message in messages),
+        'stages': stages,
+        'peak_rss_bytes': peak_rss(),
+        'rss_after_stage': rss,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(size, args):
+    root = os.path.join(args.workdir, f"repo-{size}-{args.seed}")
+    start_time = time.perf_counter()
+    generate_repo(root, size, args.seed)
+    print(f"Repositorio sintético de {size} archivos listo en {time.perf_counter() - start_time:.1f}s ({root})")
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        child_output = f.name
+    try:
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__), '--child', root, '--child-output', child_output,
+            '--repeat', str(args.repeat), '--workers', str(args.workers),
+        ], check=True)
+        with open(child_output, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    finally:
+        os.remove(child_output)
+    result['size'] = size
+    return result
+
+
+def print_results(results, baseline=None, threshold=0.1):
+    """Imprime la tabla de tiempos; con 'baseline' agrega la variación y devuelve las regresiones."""
+    previous = {result['size']: result for result in (baseline or {}).get('results', [])}
+    regressions = []
+    print(f"\n{'archivos':>9} {'etapa':<17} {'mediana':>9} {'mínimo':>9}  variación")
+    for result in results:
+        for stage in STAGES:
+            timing = result['stages'][stage]
+            line = f"{result['size']:>9} {stage:<17} {timing['median']:>8.3f}s {timing['min']:>8.3f}s"
+            old = previous.get(result['size'], {}).get('stages', {}).get(stage)
+            if old and old['median'] > 0:
+                change = timing['median'] / old['median'] - 1
+                line += f"  {change:+.1%}"
+                if change > threshold:
+                    line += '  REGRESIÓN'
+                    regressions.append((result['size'], stage, change))
+            print(line)
+        print(
+            f"{result['size']:>9} {'pico RSS':<17} {result['peak_rss_bytes'] / 2 ** 20:>8.1f} MB"
+            f"  (repo.md {result['repo_md_bytes'] / 2 ** 20:.1f} MB, {result['ts_files']} archivos TS/TSX)"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks del pipeline de documentación')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Cantidad de archivos de cada repositorio')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por etapa (se informa la mediana)')
+    parser.add_argument('--workers', type=int, default=1, help='Workers de lectura de repo_to_markdown')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='Directorio de los repositorios sintéticos')
+    parser.add_argument('--output', default='./benchmark_results.json', help='Archivo JSON de resultados')
+    parser.add_argument('--compare', help='Resultados anteriores contra los que comparar')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Variación de la mediana considerada regresión')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--child-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Los mensajes de progreso de las etapas no forman parte del benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_stages(args.child, args.repeat, args.workers)
+        with open(args.child_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return 0
+
+    results = [run_size(size, args) for size in args.sizes]
+    report = {
+        'version': RESULTS_VERSION,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'workers': args.workers,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = print_results(results, baseline, args.threshold)
+    print(f"\nResultados guardados en {os.path.abspath(args.output)}")
+    if regressions:
+        print(f"{len(regressions)} etapas más lentas que {args.compare} (> {args.threshold:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import sys
+import time
+
+import arquitecture_generator
+import docs_batch
+import docs_context
+import docs_watch
+import draw_diagram
+import guide_generator
+import llm_backends
+import llm_cache
+import llm_stream
+import model_cascade
+import readme_generator
+import repo_snapshot
+import source_compaction
+import tracing
+
+load_dotenv()
+
+# Punto de entrada único: escanea el repositorio una vez, arma el contexto
+# compartido y genera README, Arquitectura y Contribución en paralelo.
+#
+#   python build_docs.py build --all
+#   python build_docs.py build --readme --architecture --concurrency 2
+#   python build_docs.py watch --architecture
+#   python build_docs.py batch ../ ../../api --all
+#   python build_docs.py build --readme --cascade
+
+DEFAULT_CONCURRENCY = 3
+
+
+def build_documents(documents, context, args):
+    generators = {
+        'readme': lambda: readme_generator.generate_readme(stream=args.stream, context=context, cascade=args.cascade),
+        'architecture': lambda: arquitecture_generator.generate_guide(
+            stream=args.stream, map_reduce=args.map_reduce, context=context, retrieval=args.retrieval,
+            incremental=args.incremental, cascade=args.cascade,
+        ),
+        'contribution': lambda: guide_generator.generate_guide(stream=args.stream, context=context, cascade=args.cascade),
+    }
+
+    def run(document):
+        start_time = time.perf_counter()
+        try:
+            with tracing.span(document):
+                output_path = generators[document]()
+            return document, 'ok', time.perf_counter() - start_time, output_path
+        except Exception as e:
+            return document, f'error: {e}', time.perf_counter() - start_time, None
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        return list(executor.map(run, documents))
+
+
+def print_summary(scan_time, results, total_time):
+    print("\nResumen de generación:")
+    print(f"  {'contexto':<14} {'ok':<10} {scan_time:>7.2f}s")
+    for document, status, elapsed, output_path in results:
+        print(f"  {document:<14} {status:<10} {elapsed:>7.2f}s  {output_path or ''}")
+    print(f"  {'total':<14} {'':<10} {total_time:>7.2f}s")
+
+
+def build_diagram():
+    # Si el grafo y el estilo no cambiaron no se importa matplotlib
+    start_time = time.perf_counter()
+    try:
+        draw_diagram.render_if_changed()
+        return 'diagram', 'ok', time.perf_counter() - start_time, draw_diagram.PNG_PATH
+    except Exception as e:
+        return 'diagram', f'error: {e}', time.perf_counter() - start_time, None
+
+
+def add_document_arguments(parser):
+    parser.add_argument('--all', action='store_true', help='Genera README, Arquitectura y Contribución')
+    parser.add_argument('--readme', action='store_true', help='Genera ../README.md')
+    parser.add_argument('--architecture', action='store_true', help='Genera Arquitectura.md')
+    parser.add_argument('--contribution', action='store_true', help='Genera la guía de contribución')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Documentos generados en paralelo')
+    parser.add_argument('--map-reduce', action='store_true', help='Genera Arquitectura.md por secciones en paralelo')
+    parser.add_argument('--retrieval', action='store_true', help='Con --map-reduce, elige el código de cada sección con BM25')
+    model_cascade.add_arguments(parser)
+
+
+def watch_documents(documents, args):
+    # En modo watch Arquitectura.md siempre se regenera por secciones, solo
+    # las que cambiaron, y sin streaming a la terminal
+    args.stream = False
+    args.incremental = True
+
+    def on_change(state, repo_changed, tree_changed):
+        if not documents:
+            return
+        start_time = time.perf_counter()
+        results = build_documents(documents, state.context(), args)
+        print_summary(0, results, time.perf_counter() - start_time)
+
+    docs_watch.watch(on_change, polling=args.polling, compactar=args.compact)
+    return 0
+
+
+def batch_documents(documents, args):
+    try:
+        rate_limits = docs_batch.backend_rate_limits(documents, docs_batch.parse_rate_limits(args.rate_limit))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    start_time = time.perf_counter()
+    projects = llm_backends.run(docs_batch.run_batch(
+        docs_batch.project_paths(args.projects, args.output_dir), documents, args.max_in_flight, rate_limits,
+        args.workers, args.compact, map_reduce=args.map_reduce, retrieval=args.retrieval, incremental=args.incremental,
+        cascade=args.cascade,
+    ))
+    ok = docs_batch.report(projects, time.perf_counter() - start_time, args.report)
+    tracing.finish(args.trace)
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera la documentación del proyecto')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='Genera los documentos indicados')
+    add_document_arguments(build)
+    build.add_argument('--incremental', action='store_true', help='Regenera solo las secciones de Arquitectura.md cuyo código cambió')
+    build.add_argument('--diagram', action='store_true', help='Actualiza architecture.svg/png si cambió el grafo de imports')
+    build.add_argument('--snapshot', nargs='?', const=repo_snapshot.SNAPSHOT_PATH, help='Toma el código y el árbol del snapshot (repo_snapshot.py) en lugar de repo.md')
+    llm_cache.add_arguments(build)
+    llm_stream.add_arguments(build)
+    tracing.add_arguments(build)
+    watch = subparsers.add_parser('watch', help='Mantiene repo.md, el árbol y los documentos indicados al día')
+    add_document_arguments(watch)
+    watch.add_argument('--polling', action='store_true', help='Detecta cambios por sondeo en lugar de inotify')
+    watch.add_argument('--compact', choices=source_compaction.LEVELS, help='Compactación del código en repo.md')
+    batch = subparsers.add_parser('batch', help='Genera los documentos indicados de varios proyectos en paralelo')
+    batch.add_argument('projects', nargs='+', help='Raíces de los proyectos (carpetas con package.json)')
+    add_document_arguments(batch)
+    batch.add_argument('--incremental', action='store_true', help='Regenera solo las secciones de Arquitectura.md cuyo código cambió')
+    batch.add_argument('--max-in-flight', type=int, default=docs_batch.DEFAULT_MAX_IN_FLIGHT, help='Solicitudes al LLM en vuelo entre todos los proyectos')
+    batch.add_argument('--rate-limit', action='append', metavar='BACKEND=RPM', help='Solicitudes por minuto de un backend (p.ej. groq=30)')
+    batch.add_argument('--workers', type=int, help='Procesos para escanear proyectos (por defecto, uno por CPU)')
+    batch.add_argument('--compact', choices=source_compaction.LEVELS, help='Compactación del código en repo.md')
+    batch.add_argument('--output-dir', help='Escribe las salidas en <output-dir>/<proyecto>/ en lugar de en cada proyecto')
+    batch.add_argument('--report', default=docs_batch.REPORT_PATH, help='Reporte JSON de tiempos de todos los proyectos')
+    llm_cache.add_arguments(batch)
+    tracing.add_arguments(batch)
+    args = parser.parse_args()
+
+    documents = [
+        document for document in ('readme', 'architecture', 'contribution')
+        if args.all or getattr(args, document)
+    ]
+    if args.command == 'watch':
+        return watch_documents(documents, args)
+
+    if llm_cache.apply_arguments(args):
+        return 0
+    if not documents and not getattr(args, 'diagram', False):
+        parser.error('indica --all o al menos uno de --readme, --architecture, --contribution')
+    if args.command == 'batch':
+        return batch_documents(documents, args)
+
+    start_time = time.perf_counter()
+    context = docs_context.load_context(snapshot_path=args.snapshot)
+    scan_time = time.perf_counter() - start_time
+
+    results = build_documents(documents, context, args)
+    if args.diagram:
+        results.append(build_diagram())
+    print_summary(scan_time, results, time.perf_counter() - start_time)
+    tracing.finish(args.trace)
+    return 0 if all(status == 'ok' for _, status, _, _ in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
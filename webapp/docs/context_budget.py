@@ -0,0 +1,152 @@
+import os
+import re
+
+import tiktoken
+
+import tracing
+
+# Presupuesto de contexto: mide con tiktoken el template, el árbol de
+# directorios y cada archivo de repo.md contra la ventana de contexto del
+# modelo (menos los max_tokens reservados para la respuesta) y decide qué
+# archivos se mantienen, se truncan o se descartan.
+CONTEXT_WINDOWS = {
+    'qwen-2.5-coder-32b': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'llama-3.1-8b-instant': 131072,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.environ.get('DOCS_CONTEXT_WINDOW', 32768))
+
+# Margen para los tokens de formato de los mensajes de chat
+SAFETY_MARGIN = 512
+# Por debajo de esto no vale la pena truncar un archivo: se descarta
+MIN_TRUNCATED_TOKENS = 256
+# El árbol de directorios no puede usar más de esta fracción del presupuesto
+MAX_TREE_SHARE = 0.15
+
+# Orden de prioridad por capa; lo que no calza con ninguna va al final
+LAYER_PRIORITY = ['domain', 'application', 'infrastructure', 'providers', 'presentation', 'routes']
+
+FRAGMENT_START = re.compile(r'(?m)^(?=## .+\n```(?:ts|tsx)\n)')
+TRUNCATED_MARKER = '\n// ... (archivo truncado por presupuesto de contexto)\n'
+
+
+def get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Modelos que no son de OpenAI (qwen, llama, etc.): aproximación razonable
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, encoding):
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def context_window(model):
+    return CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def split_fragments(repo):
+    """Separa repo.md en fragmentos '## <ruta>\\n```<lang>...```'."""
+    return [fragment for fragment in FRAGMENT_START.split(repo) if fragment.strip()]
+
+
+def fragment_path(fragment):
+    return fragment.split('\n', 1)[0][3:].strip()
+
+
+def layer_rank(path):
+    parts = path.replace('\\', '/').split('/')
+    for rank, layer in enumerate(LAYER_PRIORITY):
+        if layer in parts:
+            return rank
+    return len(LAYER_PRIORITY)
+
+
+def priority_key(path):
+    # Primero por capa y luego los archivos modificados más recientemente
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0
+    return (layer_rank(path), -mtime, path)
+
+
+def truncate_fragment(fragment, budget, encoding):
+    header, _, body = fragment.partition('\n')
+    fence, _, code = body.partition('\n')
+    closing = '```\n'
+    overhead = count_tokens(f"{header}\n{fence}\n{TRUNCATED_MARKER}{closing}", encoding)
+    tokens = encoding.encode(code, disallowed_special=())
+    keep = max(budget - overhead, 0)
+    return f"{header}\n{fence}\n{encoding.decode(tokens[:keep])}{TRUNCATED_MARKER}{closing}"
+
+
+def truncate_tree(directory_tree, budget, encoding):
+    lines = []
+    used = 0
+    for line in directory_tree.split('\n'):
+        cost = count_tokens(line + '\n', encoding)
+        if used + cost > budget:
+            lines.append('    ... (árbol truncado)')
+            break
+        lines.append(line)
+        used += cost
+    return '\n'.join(lines)
+
+
+def fit_context(model, max_tokens, fixed_text, directory_tree, repo):
+    """
+    Ajusta 'directory_tree' y 'repo' para que, junto a 'fixed_text'
+    (template, prompt y demás texto que no se puede recortar), quepan en la
+    ventana de contexto de 'model' dejando 'max_tokens' para la respuesta.
+    Devuelve la tupla (directory_tree, repo) ajustada.
+    """
+    with tracing.span('tokens', model=model) as span:
+        directory_tree, repo, tokens = _fit_context(model, max_tokens, fixed_text, directory_tree, repo)
+        span.set(tokens=tokens)
+    return directory_tree, repo
+
+
+def _fit_context(model, max_tokens, fixed_text, directory_tree, repo):
+    encoding = get_encoding(model)
+    fixed_tokens = count_tokens(fixed_text, encoding)
+    budget = context_window(model) - (max_tokens or 0) - SAFETY_MARGIN - fixed_tokens
+    if budget <= 0:
+        print(f"Advertencia: el template y el prompt ya exceden la ventana de contexto de {model}")
+        return '', '', fixed_tokens
+
+    tree_tokens = count_tokens(directory_tree, encoding)
+    if tree_tokens > budget * MAX_TREE_SHARE:
+        directory_tree = truncate_tree(directory_tree, int(budget * MAX_TREE_SHARE), encoding)
+        tree_tokens = count_tokens(directory_tree, encoding)
+    budget -= tree_tokens
+
+    fragments = split_fragments(repo)
+    costs = [count_tokens(fragment, encoding) for fragment in fragments]
+    if sum(costs) <= budget:
+        return directory_tree, repo, fixed_tokens + tree_tokens + sum(costs)
+
+    kept = {}
+    truncated = dropped = 0
+    order = sorted(range(len(fragments)), key=lambda i: priority_key(fragment_path(fragments[i])))
+    for i in order:
+        if costs[i] <= budget:
+            kept[i] = fragments[i]
+            budget -= costs[i]
+        elif budget >= MIN_TRUNCATED_TOKENS:
+            kept[i] = truncate_fragment(fragments[i], budget, encoding)
+            budget -= count_tokens(kept[i], encoding)
+            truncated += 1
+        else:
+            dropped += 1
+
+    print(
+        f"Presupuesto de contexto ({model}): {len(kept) - truncated} archivos completos, "
+        f"{truncated} truncados, {dropped} descartados"
+    )
+    # Se conserva el orden original de repo.md
+    repo = '\n'.join(kept[i].rstrip('\n') + '\n' for i in sorted(kept))
+    used_tokens = context_window(model) - (max_tokens or 0) - SAFETY_MARGIN - budget
+    return directory_tree, repo, used_tokens
@@ -0,0 +1,168 @@
+import argparse
+import functools
+import os
+import re
+import sys
+
+import context_budget
+import docs_context
+
+# Validaciones baratas (sin LLM) de un documento generado contra su
+# template, usadas por la cascada de modelos (model_cascade.py) para decidir
+# si el borrador del modelo chico se acepta o se escala al modelo grande:
+#
+#   - están todos los encabezados del template (salvo el título '#')
+#   - los bloques de código (```) están balanceados
+#   - el largo está dentro de los límites respecto al template
+#   - las rutas citadas en `código inline` existen en el árbol de
+#     directorios o en repo.md
+#
+#   python doc_validation.py ../README.md README.template.md
+MIN_LENGTH_RATIO = 0.5
+MAX_LENGTH_RATIO = 4.0
+# Para templates cortos (secciones) el largo máximo no baja de esto
+MIN_MAX_LENGTH = 4000
+
+HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+FENCE = re.compile(r'^\s*(```|~~~)')
+INLINE_CODE = re.compile(r'`([^`\n]+)`')
+PATH_CANDIDATE = re.compile(r'^(?:\.{1,2}/)?[\w.\[\]-]+(?:/[\w.\[\]-]+)*/?$')
+PATH_EXTENSIONS = (
+    '.ts', '.tsx', '.js', '.jsx', '.cjs', '.mjs', '.json', '.md', '.yml', '.yaml', '.html', '.css', '.scss', '.sh',
+)
+TREE_ENTRY = re.compile(r'^( *)├── (.+?)/?$')
+
+
+def iter_lines(content):
+    """(línea, dentro_de_bloque_de_código) de cada línea del Markdown."""
+    inside = False
+    for line in content.split('\n'):
+        if FENCE.match(line):
+            inside = not inside
+            yield line, True
+        else:
+            yield line, inside
+
+
+def normalize_heading(text):
+    return ' '.join(text.replace('*', '').split()).lower()
+
+
+def headings(content):
+    """[(nivel, texto normalizado)] de los encabezados fuera de bloques de código."""
+    found = []
+    for line, in_code in iter_lines(content):
+        match = None if in_code else HEADING.match(line)
+        if match:
+            found.append((len(match.group(1)), normalize_heading(match.group(2))))
+    return found
+
+
+def required_headings(template):
+    """Encabezados del template que el documento debe conservar: todos menos el título (nivel 1)."""
+    found = headings(template)
+    return [heading for heading in found if heading[0] > 1] or found
+
+
+def fences_balanced(content):
+    return sum(1 for line in content.split('\n') if FENCE.match(line)) % 2 == 0
+
+
+def path_parts(path):
+    return tuple(part for part in path.replace('\\', '/').strip('/').split('/') if part not in ('', '.', '..'))
+
+
+def tree_paths(directory_tree):
+    """Rutas (como tuplas) de cada entrada del árbol de repo_scanner.render_tree."""
+    stack = []
+    for line in directory_tree.split('\n'):
+        match = TREE_ENTRY.match(line)
+        if not match:
+            continue
+        depth = len(match.group(1)) // 4
+        del stack[depth:]
+        stack.append(match.group(2))
+        yield tuple(stack)
+
+
+@functools.lru_cache(maxsize=4)
+def known_paths(directory_tree, repo=''):
+    """
+    Todos los sufijos de las rutas conocidas: las del árbol (limitado en
+    profundidad) y las de los archivos de repo.md con sus carpetas.
+    """
+    paths = set(tree_paths(directory_tree))
+    for fragment in context_budget.split_fragments(repo):
+        parts = path_parts(context_budget.fragment_path(fragment))
+        paths.update(parts[:end] for end in range(1, len(parts) + 1))
+    return frozenset(path[start:] for path in paths for start in range(len(path)))
+
+
+def referenced_paths(content):
+    """Rutas citadas en código inline fuera de bloques: 'src/domain/', 'App.tsx', ..."""
+    found = []
+    for line, in_code in iter_lines(content):
+        if in_code:
+            continue
+        for candidate in INLINE_CODE.findall(line):
+            candidate = candidate.strip()
+            if candidate.startswith('@') or '*' in candidate or not PATH_CANDIDATE.match(candidate):
+                continue
+            if '/' in candidate or candidate.endswith(PATH_EXTENSIONS):
+                found.append(candidate)
+    return list(dict.fromkeys(found))
+
+
+def validate(content, template, directory_tree, repo=''):
+    """Lista de problemas del documento; vacía si pasa todas las validaciones."""
+    problems = []
+    present = {text for _, text in headings(content)}
+    missing = [text for _, text in required_headings(template) if text not in present]
+    if missing:
+        problems.append(f"faltan {len(missing)} encabezados del template ({missing[0]!r}, ...)")
+
+    if not fences_balanced(content):
+        problems.append("bloques de código sin cerrar")
+
+    min_length = int(len(template) * MIN_LENGTH_RATIO)
+    max_length = max(int(len(template) * MAX_LENGTH_RATIO), MIN_MAX_LENGTH)
+    if not min_length <= len(content) <= max_length:
+        problems.append(f"largo {len(content)} fuera de [{min_length}, {max_length}]")
+
+    # Las rutas que ya cita el template se aceptan aunque no existan
+    cited = set(referenced_paths(template))
+    known = known_paths(directory_tree, repo)
+    unknown = [
+        path for path in referenced_paths(content)
+        if path not in cited and path_parts(path) and path_parts(path) not in known
+    ]
+    if unknown:
+        problems.append(f"{len(unknown)} rutas que no existen ({', '.join(unknown[:3])})")
+    return problems
+
+
+def validator(template, directory_tree, repo=''):
+    """validate() con el template y el contexto fijos, para pasar a la cascada."""
+    return functools.partial(validate, template=template, directory_tree=directory_tree, repo=repo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Valida un documento generado contra su template')
+    parser.add_argument('document')
+    parser.add_argument('template')
+    args = parser.parse_args()
+
+    context = docs_context.load_context()
+    with open(args.document, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with open(args.template, 'r', encoding='utf-8') as f:
+        template = f.read()
+    problems = validate(content, template, context['directory_tree'], context['repo'])
+    for problem in problems:
+        print(f"  - {problem}")
+    print(f"{os.path.basename(args.document)}: {'ok' if not problems else f'{len(problems)} problemas'}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
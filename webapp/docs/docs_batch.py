@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import arquitecture_generator
+import doc_validation
+import docs_context
+import guide_generator
+import llm_backends
+import llm_cache
+import llm_stream
+import model_cascade
+import readme_generator
+import repo_scanner
+import repo_to_markdown
+import retrieval_index
+import tracing
+
+# Modo batch: genera la documentación de varios proyectos (p.ej. webapp/ y
+# api/, o una flota de repos creados desde el mismo boilerplate) en una
+# sola ejecución:
+#
+#   python build_docs.py batch ../ ../../api --all
+#   python build_docs.py batch ~/repos/* --readme --output-dir ./salida
+#
+# Cada proyecto se escanea (índice, repo.md y árbol) en un pool de
+# procesos; a medida que termina su escaneo, sus documentos entran a una
+# cola asyncio. Todas las solicitudes al LLM comparten un límite global de
+# solicitudes en vuelo (--max-in-flight) y, por backend, un límite de
+# solicitudes por minuto (Backend.rate_limit o --rate-limit groq=30).
+#
+# Las salidas respetan la estructura de cada proyecto: README.md en la raíz
+# y el resto (repo.md, Arquitectura.md, guía y estado incremental) en
+# docs/. Con --output-dir se escriben en <output-dir>/<proyecto>/ en lugar
+# de sobre cada proyecto.
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get('DOCS_BATCH_MAX_IN_FLIGHT', 8))
+REPORT_PATH = './batch_report.json'
+# Ruta de salida de cada documento, relativa a la raíz del proyecto
+OUTPUTS = {
+    'readme': 'README.md',
+    'architecture': os.path.join('docs', 'Arquitectura.md'),
+    'contribution': os.path.join('docs', 'Guía de Contribución y Arquitectura del Proyecto.md'),
+}
+
+
+class BackendLimit:
+    """Context manager asíncrono reutilizable: un turno del backend 'name' en el RequestLimiter."""
+
+    def __init__(self, limiter, name):
+        self.limiter = limiter
+        self.name = name
+
+    async def __aenter__(self):
+        await self.limiter.acquire(self.name)
+
+    async def __aexit__(self, *exc_info):
+        self.limiter.release()
+
+
+class RequestLimiter:
+    """
+    Límite global de solicitudes en vuelo más un límite de solicitudes por
+    minuto por backend: los turnos de un backend se espacian 60 / rate_limit
+    segundos.
+    """
+
+    def __init__(self, max_in_flight, rate_limits=None):
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.intervals = {name: 60 / rate for name, rate in (rate_limits or {}).items() if rate}
+        self.next_slot = {}
+
+    async def acquire(self, name):
+        # Primero el cupo en vuelo y después el turno: si el turno se reservara
+        # antes, los que esperan el semáforo saldrían todos juntos al liberarse
+        await self.semaphore.acquire()
+        interval = self.intervals.get(name)
+        if not interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slot.get(name, now))
+        self.next_slot[name] = slot + interval
+        try:
+            await asyncio.sleep(slot - now)
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    def release(self):
+        self.semaphore.release()
+
+    def backend(self, name):
+        return BackendLimit(self, name)
+
+
+def parse_rate_limits(values):
+    """['groq=30', 'openai=500'] -> {'groq': 30.0, 'openai': 500.0}"""
+    rate_limits = {}
+    for value in values or []:
+        name, _, rate = value.partition('=')
+        try:
+            rate_limits[name] = float(rate)
+        except ValueError:
+            raise ValueError(f"Límite inválido '{value}': se espera backend=solicitudes_por_minuto")
+    return rate_limits
+
+
+def backend_rate_limits(documents, overrides=None):
+    """Límite por minuto de cada backend que usan los documentos, con los de --rate-limit encima."""
+    modules = {'readme': readme_generator, 'architecture': arquitecture_generator, 'contribution': guide_generator}
+    rate_limits = {}
+    for document in documents:
+        backend = llm_backends.get_backend(modules[document].BACKEND)
+        rate_limits[backend.name] = backend.rate_limit
+    rate_limits.update(overrides or {})
+    return rate_limits
+
+
+def project_paths(roots, output_dir=None):
+    """
+    Lista de proyectos {'name', 'root', 'output_root', 'docs_dir'}. El nombre
+    es el de la carpeta (con sufijo si se repite).
+    """
+    projects = []
+    names = set()
+    for root in roots:
+        root = os.path.abspath(root)
+        name = base = os.path.basename(root.rstrip(os.sep)) or 'proyecto'
+        suffix = 2
+        while name in names:
+            name = f"{base}-{suffix}"
+            suffix += 1
+        names.add(name)
+        output_root = os.path.join(os.path.abspath(output_dir), name) if output_dir else root
+        projects.append({
+            'name': name,
+            'root': root,
+            'output_root': output_root,
+            'docs_dir': os.path.join(output_root, 'docs'),
+            'documents': {},
+        })
+    return projects
+
+
+def scan_project(root, docs_dir, compactar=None):
+    """
+    Escanea un proyecto (se ejecuta en el pool de procesos): índice, repo.md
+    incremental y árbol, con el estado guardado en 'docs_dir'. Devuelve el
+    contexto de los generadores y las estadísticas de lectura.
+    """
+    os.makedirs(docs_dir, exist_ok=True)
+    # El índice queda en memoria para el árbol y la lectura de archivos
+    repo_scanner.get_index(root, index_path=os.path.join(docs_dir, repo_scanner.INDEX_PATH))
+    rutas = [
+        ruta for ruta in (
+            os.path.join(root, os.path.relpath(ruta, repo_scanner.DEFAULT_ROOT)) for ruta in repo_to_markdown.RUTAS
+        )
+        if os.path.isdir(ruta)
+    ]
+    repo_path = os.path.join(docs_dir, 'repo.md')
+    estadisticas = {}
+    repo_to_markdown.escribir_markdown(repo_to_markdown.iterar_markdown_ts_tsx(
+        rutas, os.path.join(docs_dir, repo_to_markdown.MANIFEST_PATH), estadisticas=estadisticas, compactar=compactar,
+        root=root,
+    ), repo_path)
+    context = docs_context.load_context(os.path.join(root, 'package.json'), repo_path, root)
+    return context, {'files': estadisticas['archivos'], 'bytes': estadisticas['bytes']}
+
+
+async def complete(module, messages, max_tokens, limiter, validate=None, label=None):
+    """Solicitud con el límite del backend; con 'validate' pasa por la cascada de modelos."""
+    backend = llm_backends.get_backend(module.BACKEND)
+    client = llm_backends.get_async_client(module.BACKEND)
+    if validate is not None:
+        return await model_cascade.cascade_completion_async(
+            client, messages, backend, max_tokens, validate, label, limiter.backend(backend.name)
+        )
+    async with limiter.backend(backend.name):
+        return await llm_cache.cached_completion_async(client, messages, backend.model, max_tokens)
+
+
+async def generate_document(project, document, limiter, options):
+    """Genera un documento del proyecto y devuelve la ruta escrita."""
+    context = project['context']
+    project_name = context['project_name']
+    package_json = context['package_json']
+    directory_tree = context['directory_tree']
+    repo = context['repo']
+    cascade = options.get('cascade', False)
+    label = f"{project['name']}: {document}"
+
+    if document == 'readme':
+        template = readme_generator.load_template(
+            project_name, context['project_version'], context['project_description']
+        )
+        model = llm_backends.get_backend(readme_generator.BACKEND).model
+        messages = readme_generator.build_messages(
+            template, project_name, readme_generator.get_repository_url(context['package']), package_json,
+            directory_tree, repo, model,
+        )
+        validate = doc_validation.validator(template, directory_tree, repo) if cascade else None
+        content = await complete(readme_generator, messages, readme_generator.MAX_TOKENS, limiter, validate, label)
+    elif document == 'contribution':
+        repository_url = readme_generator.get_repository_url(context['package'], guide_generator.REPOSITORY_URL)
+        template = guide_generator.generate_template(project_name, context['project_version'], repository_url)
+        model = llm_backends.get_backend(guide_generator.BACKEND).model
+        messages = guide_generator.build_messages(
+            template, project_name, repository_url, package_json, directory_tree, model
+        )
+        validate = doc_validation.validator(template, directory_tree) if cascade else None
+        content = await complete(guide_generator, messages, None, limiter, validate, label)
+    else:
+        repository_url = readme_generator.get_repository_url(context['package'], arquitecture_generator.REPOSITORY_URL)
+        with open('./Template.md', 'r', encoding='utf-8') as f:
+            template = f.read()
+        if options.get('map_reduce') or options.get('incremental'):
+            backend = llm_backends.get_backend(arquitecture_generator.BACKEND)
+            content = await arquitecture_generator.llm_guide_content_map_reduce(
+                template, project_name, repository_url, directory_tree, repo,
+                retrieval=options.get('retrieval', False), incremental=options.get('incremental', False),
+                semaphore=limiter.backend(backend.name),
+                sections_path=os.path.join(project['docs_dir'], arquitecture_generator.SECTIONS_PATH),
+                index_path=os.path.join(project['docs_dir'], retrieval_index.INDEX_PATH),
+                package_json=package_json, cascade=cascade,
+            )
+        else:
+            model = llm_backends.get_backend(arquitecture_generator.BACKEND).model
+            messages = arquitecture_generator.build_messages(
+                template, project_name, repository_url, package_json, directory_tree, repo, model
+            )
+            validate = doc_validation.validator(template, directory_tree, repo) if cascade else None
+            content = await complete(
+                arquitecture_generator, messages, arquitecture_generator.MAX_TOKENS, limiter, validate, label
+            )
+
+    output_path = os.path.join(project['output_root'], OUTPUTS[document])
+    llm_stream.write_atomic(output_path, content)
+    return output_path
+
+
+async def run_batch(projects, documents, max_in_flight=DEFAULT_MAX_IN_FLIGHT, rate_limits=None, workers=None,
+                    compactar=None, **options):
+    """
+    Escanea los proyectos en un pool de procesos y genera sus documentos
+    desde una cola compartida. Completa en cada proyecto 'scan' y
+    'documents' con estado, segundos y ruta.
+    """
+    limiter = RequestLimiter(max_in_flight, rate_limits)
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    async def scan(executor, project):
+        start_time = time.perf_counter()
+        try:
+            project['context'], stats = await loop.run_in_executor(
+                executor, scan_project, project['root'], project['docs_dir'], compactar
+            )
+            project['scan'] = {'status': 'ok', **stats}
+            for document in documents:
+                queue.put_nowait((project, document))
+        except Exception as e:
+            project['scan'] = {'status': f'error: {e}'}
+        end_time = time.perf_counter()
+        project['scan']['seconds'] = end_time - start_time
+        tracing.record('scan', start_time, end_time, project=project['name'])
+        print(f"{project['name']}: escaneo {project['scan']['status']} en {end_time - start_time:.2f}s")
+
+    async def worker():
+        while True:
+            project, document = await queue.get()
+            start_time = time.perf_counter()
+            try:
+                with tracing.span(document, project=project['name']):
+                    output_path = await generate_document(project, document, limiter, options)
+                status = 'ok'
+            except Exception as e:
+                output_path, status = None, f'error: {e}'
+            project['documents'][document] = {
+                'status': status, 'seconds': time.perf_counter() - start_time, 'path': output_path,
+            }
+            print(f"{project['name']}: {document} {status} en {project['documents'][document]['seconds']:.2f}s")
+            queue.task_done()
+
+    # Los documentos de un proyecto empiezan apenas termina su escaneo, sin
+    # esperar al resto de la flota
+    tasks = [asyncio.create_task(worker()) for _ in range(max_in_flight)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            await asyncio.gather(*(scan(executor, project) for project in projects))
+        await queue.join()
+    finally:
+        for task in tasks:
+            task.cancel()
+    return projects
+
+
+def report(projects, total_time, report_path=REPORT_PATH):
+    """Imprime el resumen combinado y lo guarda en JSON. Devuelve True si todo terminó bien."""
+    print("\nResumen del batch:")
+    ok = True
+    for project in projects:
+        scan = project.get('scan', {'status': 'pendiente', 'seconds': 0})
+        ok = ok and scan['status'] == 'ok'
+        print(f"  {project['name']:<20} {'escaneo':<14} {scan['status']:<10} {scan['seconds']:>7.2f}s")
+        for document, result in project['documents'].items():
+            ok = ok and result['status'] == 'ok'
+            print(f"  {'':<20} {document:<14} {result['status']:<10} {result['seconds']:>7.2f}s  {result['path'] or ''}")
+    print(f"  {'total':<20} {'':<14} {'':<10} {total_time:>7.2f}s")
+
+    data = {
+        'total_seconds': total_time,
+        'projects': [
+            {key: project[key] for key in ('name', 'root', 'output_root', 'documents')} | {'scan': project.get('scan')}
+            for project in projects
+        ],
+    }
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, report_path)
+    print(f"Reporte guardado en {os.path.abspath(report_path)}")
+    return ok
@@ -0,0 +1,54 @@
+import json
+import os
+
+import repo_scanner
+import repo_snapshot
+import tracing
+
+# Contexto compartido por los generadores: package.json, árbol de
+# directorios y repo.md se leen una sola vez y se reutilizan para
+# README.md, Arquitectura.md y la guía de contribución. Con 'snapshot_path'
+# el código y el árbol salen del snapshot binario (ver repo_snapshot.py) en
+# lugar de repo.md y de un nuevo escaneo.
+
+
+def load_context(package_path='../package.json', repo_path='./repo.md', root='../', snapshot_path=None):
+    with open(package_path, 'r', encoding='utf-8') as f:
+        package_json = f.read()
+        package = json.loads(package_json)  # Parse the raw string into a JSON object if needed
+
+    if snapshot_path:
+        with tracing.span('read', path=snapshot_path) as span:
+            with repo_snapshot.Snapshot(snapshot_path) as snapshot:
+                repo = snapshot.repo()
+                directory_tree = snapshot.tree
+            span.set(bytes=len(repo.encode('utf-8')))
+    else:
+        with tracing.span('read', path=repo_path) as span:
+            try:
+                with open(repo_path, 'r', encoding='utf-8') as f:
+                    span.set(bytes=os.fstat(f.fileno()).st_size)
+                    repo = f.read()
+            except FileNotFoundError:
+                print("No se encontró el archivo repo.md. Procediendo sin información del repositorio.")
+                repo = ""
+        directory_tree = generate_directory_tree(root)
+
+    return {
+        'package_json': package_json,
+        'package': package,
+        'project_name': package.get('name', 'Nombre del Proyecto'),
+        'project_version': package.get('version', '1.0.0'),
+        'project_description': package.get('description', ''),
+        'directory_tree': directory_tree,
+        'repo': repo,
+    }
+
+
+def generate_directory_tree(root='../'):
+    with tracing.span('scan', root=root):
+        index = repo_scanner.get_index(root)
+    with tracing.span('render') as span:
+        tree = repo_scanner.render_tree(index)
+        span.set(bytes=len(tree.encode('utf-8')))
+    return tree
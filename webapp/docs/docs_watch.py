@@ -0,0 +1,303 @@
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+
+import docs_context
+import ignore_rules
+import repo_scanner
+import repo_to_markdown
+
+# Modo watch: mantiene repo.md, el árbol de directorios y (opcionalmente)
+# los documentos generados al día mientras se edita el código.
+#
+#   python build_docs.py watch                 # solo repo.md y el árbol
+#   python build_docs.py watch --architecture  # además Arquitectura.md por secciones
+#
+# Los cambios se detectan con inotify (Linux) o, si no está disponible, por
+# sondeo. Las ráfagas de eventos se agrupan: se reconstruye cuando pasan
+# DEBOUNCE_SECONDS sin eventos nuevos (o MAX_DELAY_SECONDS desde el primero).
+# El índice del repositorio y los fragmentos de repo.md quedan en memoria
+# entre reconstrucciones, de modo que cada una solo relee lo que cambió.
+DEBOUNCE_SECONDS = float(os.environ.get('DOCS_WATCH_DEBOUNCE', 0.5))
+MAX_DELAY_SECONDS = float(os.environ.get('DOCS_WATCH_MAX_DELAY', 5))
+POLL_SECONDS = float(os.environ.get('DOCS_WATCH_POLL', 1))
+REPO_PATH = './repo.md'
+# Salidas del propio watch y de los generadores: escribirlas no es un cambio del código
+OUTPUT_PATHS = (
+    REPO_PATH,
+    REPO_PATH + '.tmp',
+    '../README.md',
+    './Arquitectura.md',
+    './Guía de Contribución y Arquitectura del Proyecto.md',
+    './architecture.svg',
+    './architecture.png',
+)
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+# Crear, borrar o mover cambia la estructura: hay que refrescar el índice
+STRUCTURAL_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_Q_OVERFLOW
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Vigila con inotify todos los directorios del índice (los ignorados ya están podados)."""
+
+    def __init__(self, index):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.root = index['root']
+        self.directories = {}
+        self.watch_index(index)
+
+    def watch_index(self, index):
+        for rel in index['directories']:
+            path = os.path.join(index['root'], *rel.split('/')) if rel else index['root']
+            if path not in self.directories.values():
+                self.add(path)
+
+    def add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch {path}')
+        self.directories[wd] = path
+
+    def read(self, timeout):
+        """Lista de (ruta, estructural) de los eventos recibidos en 'timeout' segundos."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # La cola se desbordó (llega con wd == -1): se perdieron eventos y
+                # hay que volver a revisar todo el árbol
+                events.append((self.root, True))
+                continue
+            directory = self.directories.get(wd)
+            if mask & IN_DELETE_SELF:
+                self.directories.pop(wd, None)
+            if directory is None:
+                continue
+            events.append((os.path.join(directory, name) if name else directory, bool(mask & STRUCTURAL_MASK)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Alternativa sin inotify: compara size y mtime de los archivos indexados cada POLL_SECONDS."""
+
+    def __init__(self, index, interval=POLL_SECONDS):
+        self.interval = interval
+        self.root = index['root']
+        self.snapshot = self.take_snapshot(index)
+
+    @staticmethod
+    def take_snapshot(index):
+        snapshot = {}
+        for entry in repo_scanner.iter_entries(index):
+            if entry.type != 'file':
+                continue
+            path = os.path.join(index['root'], *entry.path.split('/'))
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def watch_index(self, index):
+        self.snapshot = self.take_snapshot(index)
+
+    def read(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        index = repo_scanner.get_index(self.root, refresh=True)
+        snapshot = self.take_snapshot(index)
+        events = [(path, path not in self.snapshot) for path in snapshot if snapshot[path] != self.snapshot.get(path)]
+        events += [(path, True) for path in self.snapshot if path not in snapshot]
+        self.snapshot = snapshot
+        return events
+
+    def close(self):
+        pass
+
+
+def make_watcher(index, polling=False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(index)
+        except (OSError, AttributeError) as e:
+            # ENOSPC: se alcanzó fs.inotify.max_user_watches
+            reason = errno.errorcode.get(e.errno, str(e)) if isinstance(e, OSError) else str(e)
+            print(f"inotify no disponible ({reason}); se usa sondeo cada {POLL_SECONDS}s")
+    return PollingWatcher(index)
+
+
+class DocsState:
+    """
+    Estado en memoria entre reconstrucciones: el índice del repositorio,
+    un fragmento de repo.md por archivo y el árbol de directorios.
+    """
+
+    def __init__(self, root=repo_scanner.DEFAULT_ROOT, rutas=repo_to_markdown.RUTAS, compactar=None):
+        self.root = root
+        self.rutas = rutas
+        self.compactar = compactar
+        self.index = repo_scanner.get_index(root)
+        self.matcher = ignore_rules.load_matcher(self.index['root'])
+        self.outputs = {os.path.abspath(path) for path in OUTPUT_PATHS}
+        self.fragments = {}
+        self.repo_hash = None
+        self.tree = None
+
+    def source_files(self):
+        return [
+            path
+            for ruta in self.rutas
+            for path in repo_scanner.iter_files(os.path.abspath(ruta), repo_to_markdown.EXTENSIONES, self.root)
+        ]
+
+    def render(self, path):
+        fragmento, _, _ = repo_to_markdown.fragmento_archivo(path, {}, {}, False, compactar=self.compactar)
+        return fragmento
+
+    def refresh(self, changed=(), structural=True):
+        """
+        Aplica los cambios y devuelve (repo_cambió, árbol_cambió). Solo se
+        releen los archivos de 'changed' y los nuevos; si hubo archivos
+        creados, borrados o movidos se refresca el índice. Si 'changed'
+        incluye la raíz (p.ej. tras un desbordamiento de inotify) se releen
+        todos.
+        """
+        if structural:
+            self.index = repo_scanner.get_index(self.root, refresh=True)
+            self.matcher = ignore_rules.load_matcher(self.index['root'])
+        changed = {os.path.abspath(path) for path in changed}
+        if os.path.abspath(self.root) in changed:
+            self.fragments = {}
+        fragments = {}
+        for path in self.source_files():
+            if path in changed or path not in self.fragments:
+                fragments[path] = self.render(path)
+            else:
+                fragments[path] = self.fragments[path]
+        self.fragments = fragments
+
+        repo_hash = hashlib.sha256('\n'.join(fragments.values()).encode('utf-8')).hexdigest()
+        repo_changed = repo_hash != self.repo_hash
+        if repo_changed:
+            repo_to_markdown.escribir_markdown(fragments.values(), REPO_PATH)
+            self.repo_hash = repo_hash
+
+        tree = repo_scanner.render_tree(self.index)
+        tree_changed = tree != self.tree
+        self.tree = tree
+        return repo_changed, tree_changed
+
+    def context(self):
+        context = docs_context.load_context(repo_path=REPO_PATH)
+        context['directory_tree'] = self.tree
+        return context
+
+    def relevant(self, path):
+        """
+        Si un evento en 'path' amerita reconstruir: no los archivos ocultos
+        (temporales de los generadores y editores), ni las salidas de los
+        generadores, ni lo que excluyen .gitignore, .dockerignore y .docsignore.
+        """
+        path = os.path.abspath(path)
+        rel = os.path.relpath(path, self.index['root']).replace(os.sep, '/')
+        if rel == '.':
+            # Desbordamiento de inotify: se revisa todo
+            return True
+        if os.path.basename(path).startswith('.') or path in self.outputs:
+            return False
+        # Un archivo dentro de una carpeta ignorada también se ignora
+        parts = rel.split('/')
+        return not any(
+            self.matcher.ignored('/'.join(parts[:end]), end < len(parts) or os.path.isdir(path))
+            for end in range(1, len(parts) + 1)
+        )
+
+
+def watch(on_change=None, polling=False, compactar=None):
+    """
+    Bucle principal. Tras cada reconstrucción con cambios se llama a
+    on_change(state, repo_changed, tree_changed) (p.ej. para regenerar los
+    documentos). Se detiene con Ctrl+C.
+    """
+    start_time = time.perf_counter()
+    state = DocsState(compactar=compactar)
+    state.refresh()
+    print(f"repo.md y árbol listos en {time.perf_counter() - start_time:.2f}s ({len(state.fragments)} archivos)")
+    if on_change:
+        on_change(state, True, True)
+
+    watcher = make_watcher(state.index, polling)
+    print(f"Vigilando {state.index['root']} ({type(watcher).__name__}); Ctrl+C para salir")
+    pending = set()
+    structural = False
+    first_event = last_event = None
+    try:
+        while True:
+            timeout = None if not pending else max(
+                0, min(last_event + DEBOUNCE_SECONDS, first_event + MAX_DELAY_SECONDS) - time.monotonic()
+            )
+            events = [(path, is_structural) for path, is_structural in watcher.read(timeout) if state.relevant(path)]
+            now = time.monotonic()
+            if events:
+                first_event = first_event or now
+                last_event = now
+                pending.update(path for path, _ in events)
+                structural = structural or any(is_structural for _, is_structural in events)
+            if not pending or (now - last_event < DEBOUNCE_SECONDS and now - first_event < MAX_DELAY_SECONDS):
+                continue
+
+            start_time = time.perf_counter()
+            repo_changed, tree_changed = state.refresh(pending, structural)
+            if structural:
+                watcher.watch_index(state.index)
+            if repo_changed or tree_changed:
+                print(
+                    f"Actualizado en {time.perf_counter() - start_time:.2f}s: {len(pending)} cambios"
+                    f"{', repo.md' if repo_changed else ''}{', árbol' if tree_changed else ''}"
+                )
+                if on_change:
+                    on_change(state, repo_changed, tree_changed)
+            pending = set()
+            structural = False
+            first_event = last_event = None
+    except KeyboardInterrupt:
+        print("\nWatch detenido")
+    finally:
+        watcher.close()
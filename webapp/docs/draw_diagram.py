@@ -1,31 +1,33 @@
-# Reimportar las librerías necesarias debido al reinicio del estado
-import matplotlib.pyplot as plt
-import networkx as nx
+import argparse
+import hashlib
+import json
+import os
+import sys
 
-# Crear el gráfico dirigido
-G = nx.DiGraph()
+import import_graph
+import tracing
+
+# Diagrama de la arquitectura hexagonal a partir de los imports reales del
+# código (ver import_graph.py).
+#
+#   python draw_diagram.py           # escribe architecture.svg y architecture.png
+#   python draw_diagram.py --show    # abre la ventana interactiva
+#
+# El render es headless (backend Agg). Antes de importar matplotlib y
+# networkx se calcula el hash del grafo, las posiciones y el estilo. El hash
+# queda en los metadatos de architecture.svg y architecture.png (que están
+# en el repositorio): si las salidas ya lo tienen, no se importa ni se
+# dibuja nada, también en CI.
+SVG_PATH = './architecture.svg'
+PNG_PATH = './architecture.png'
+# Prefijo del hash en los metadatos (descripción) del SVG y del PNG
+HASH_TAG = 'diagram-hash:'
+# El PNG se reduce a una paleta de pocos colores: el diagrama usa ~10
+PNG_COLORS = 64
 
 # Nodos principales
 layers = ["Domain", "App", "Infrastructure", "Providers", "Presentation", "Theme", "Router", "Device/HTTP/Storage"]
 
-# Agregar nodos
-G.add_nodes_from(layers)
-
-# Agregar relaciones entre capas
-edges = [
-    ("Infrastructure", "Providers"),
-    ("Infrastructure", "App"),
-    ("Providers", "App"),
-    ("App", "Providers"),
-    ("Providers", "Presentation"),
-    ("Presentation", "Providers"),
-    ("Theme", "Presentation"),
-    ("Router", "Presentation"),
-    ("Device/HTTP/Storage", "Infrastructure"),
-]
-
-G.add_edges_from(edges)
-
 # Posiciones personalizadas (hexágono con nodo adicional)
 positions = {
     "Domain": (0, 0),
@@ -50,24 +52,155 @@ node_colors = {
     "Device/HTTP/Storage": "#c2c2f0"  # Púrpura claro
 }
 
-# Crear lista de colores en orden de nodos
-node_colors_list = [node_colors[node] for node in G.nodes]
+# Estilo del dibujo; cualquier cambio aquí invalida el render anterior
+style = {
+    "figsize": (10, 10),
+    "dpi": 100,
+    "node_size": 4900,
+    "arrowsize": 20,
+    "font_size": 9,
+    "title": "Arquitectura Hexagonal",
+    "title_size": 18,
+    "margin": 0.12,
+}
+
+
+def diagram_hash(edges):
+    """Hash de las aristas (con su peso), las posiciones, los colores y el estilo."""
+    data = {
+        'layers': layers,
+        'edges': sorted([source, target, weight] for (source, target), weight in edges.items()),
+        'positions': positions,
+        'colors': node_colors,
+        'style': style,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def has_hash(path, digest):
+    """True si 'path' existe y sus metadatos tienen el hash (el texto va sin comprimir en SVG y PNG)."""
+    try:
+        with open(path, 'rb') as f:
+            return (HASH_TAG + digest).encode('ascii') in f.read()
+    except FileNotFoundError:
+        return False
+
+
+def draw(edges):
+    """Dibuja el diagrama en una figura nueva y la devuelve."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    # Crear el gráfico dirigido: capa importada -> capa que la usa
+    G = import_graph.build_graph(edges, layers)
+
+    # Crear lista de colores en orden de nodos
+    node_colors_list = [node_colors[node] for node in G.nodes]
+
+    # Dibujar el grafo
+    figure = plt.figure(figsize=style["figsize"])
+    nx.draw_networkx_nodes(G, pos=positions, node_size=style["node_size"], node_color=node_colors_list, edgecolors="black")
+    # Las dependencias del dominio (puertos y modelos) van con líneas punteadas
+    domain_edges = [edge for edge in G.edges if "Domain" in edge]
+    nx.draw_networkx_edges(
+        G, pos=positions, edgelist=[edge for edge in G.edges if edge not in domain_edges],
+        node_size=style["node_size"], arrowstyle="->", arrowsize=style["arrowsize"], edge_color="gray"
+    )
+    nx.draw_networkx_edges(
+        G, pos=positions, edgelist=domain_edges,
+        node_size=style["node_size"], arrowstyle="->", arrowsize=style["arrowsize"], style="dashed", edge_color="black"
+    )
+
+    # Dibujar etiquetas
+    nx.draw_networkx_labels(G, pos=positions, font_size=style["font_size"], font_color="black", font_weight="bold")
+
+    # Configurar diseño
+    plt.title(style["title"], fontsize=style["title_size"])
+    plt.axis("off")
+    # Margen para que las etiquetas de los nodos del borde no queden cortadas
+    plt.margins(style["margin"])
+    return figure
+
+
+def optimize_png(png_path, colors=PNG_COLORS, description=None):
+    """Reduce el PNG a una paleta de 'colors' colores (Pillow viene con matplotlib)."""
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    with Image.open(png_path) as image:
+        image.load()
+    info = PngInfo()
+    if description:
+        info.add_text('Description', description)
+    tmp_path = png_path + '.tmp.png'
+    image.convert('RGB').quantize(colors=colors).save(tmp_path, optimize=True, pnginfo=info)
+    os.replace(tmp_path, png_path)
+
+
+def render(edges, svg_path=SVG_PATH, png_path=PNG_PATH, digest=None):
+    """
+    Render headless con el backend Agg: SVG con el texto como texto y PNG
+    optimizado, con 'digest' (diagram_hash) en la descripción de ambos.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # Sin fecha ni ids aleatorios, para que el SVG no cambie si el grafo no cambia
+    matplotlib.rcParams['svg.fonttype'] = 'none'
+    matplotlib.rcParams['svg.hashsalt'] = 'architecture'
+    description = HASH_TAG + (digest or diagram_hash(edges))
+    figure = draw(edges)
+    try:
+        if svg_path:
+            figure.savefig(
+                svg_path, format='svg', bbox_inches='tight', metadata={'Date': None, 'Description': description}
+            )
+        if png_path:
+            figure.savefig(png_path, format='png', dpi=style["dpi"], bbox_inches='tight', metadata={'Software': None})
+            optimize_png(png_path, description=description)
+    finally:
+        plt.close(figure)
+
+
+def render_if_changed(edges=None, svg_path=SVG_PATH, png_path=PNG_PATH, force=False):
+    """
+    Renderiza solo si alguna salida falta o no tiene el hash actual del
+    diagrama. Devuelve True si se dibujó.
+    """
+    with tracing.span('diagram') as span:
+        if edges is None:
+            edges = import_graph.layer_edges(import_graph.extract())
+        digest = diagram_hash(edges)
+        outputs = [path for path in (svg_path, png_path) if path]
+        if not force and all(has_hash(path, digest) for path in outputs):
+            span.set(cached=True)
+            print(f"Diagrama sin cambios ({digest[:12]}); se omite el render")
+            return False
+        render(edges, svg_path, png_path, digest)
+        span.set(bytes=sum(os.path.getsize(path) for path in outputs))
+    for path in outputs:
+        print(f"Diagrama guardado en {os.path.abspath(path)} ({os.path.getsize(path) / 1024:.0f} KB)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dibuja el diagrama de arquitectura a partir de los imports')
+    parser.add_argument('--svg', default=SVG_PATH, help="Salida SVG ('' para no generarla)")
+    parser.add_argument('--png', default=PNG_PATH, help="Salida PNG ('' para no generarla)")
+    parser.add_argument('--force', action='store_true', help='Renderiza aunque el diagrama no haya cambiado')
+    parser.add_argument('--show', action='store_true', help='Abre la ventana interactiva en lugar de escribir archivos')
+    args = parser.parse_args()
 
-# Dibujar el grafo
-plt.figure(figsize=(10, 10))
-nx.draw_networkx_nodes(G, pos=positions, node_size=4900, node_color=node_colors_list, edgecolors="black")
-nx.draw_networkx_edges(G, pos=positions, arrowstyle="->", arrowsize=20, edge_color="gray")
+    if args.show:
+        import matplotlib.pyplot as plt
 
-# Dibujar líneas punteadas entre Domain - Providers y Providers - Infrastructure
-nx.draw_networkx_edges(
-    G, pos=positions, edgelist=[("Providers", "Domain"), ("Domain", "App"), ("Domain", "Infrastructure"), ("App", "Infrastructure")],
-    style="dashed", edge_color="black"
-)
+        draw(import_graph.layer_edges(import_graph.extract()))
+        plt.show()
+        return 0
+    render_if_changed(svg_path=args.svg, png_path=args.png, force=args.force)
+    return 0
 
-# Dibujar etiquetas
-nx.draw_networkx_labels(G, pos=positions, font_size=9, font_color="black", font_weight="bold")
 
-# Configurar diseño
-plt.title("Arquitectura Hexagonal", fontsize=18)
-plt.axis("off")
-plt.show()
+if __name__ == '__main__':
+    sys.exit(main())
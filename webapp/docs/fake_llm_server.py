@@ -0,0 +1,100 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import time
+
+# Servidor HTTP local compatible con /v1/chat/completions de OpenAI, para
+# probar reintentos, hedging y latencias sin red. Permite simular colas de
+# latencia (una fracción de solicitudes lentas) y errores 429/503.
+#
+#   python fake_llm_server.py --latency 0.2 --slow-rate 0.05 --slow-latency 3 --error-rate 0.1
+
+
+def completion_body(model, text):
+    return {
+        'id': f'chatcmpl-fake-{random.getrandbits(32):08x}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': text},
+            'finish_reason': 'stop',
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': len(text.split()), 'total_tokens': len(text.split())},
+    }
+
+
+def make_handler(options):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            if options.verbose:
+                super().log_message(format, *args)
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_json(404, {'error': {'message': 'not found'}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+            roll = random.random()
+            if roll < options.error_rate / 2:
+                self.send_json(429, {'error': {'message': 'rate limited', 'type': 'rate_limit'}},
+                               {'Retry-After': str(options.retry_after)})
+                return
+            if roll < options.error_rate:
+                self.send_json(503, {'error': {'message': 'unavailable'}})
+                return
+
+            slow = random.random() < options.slow_rate
+            time.sleep(options.slow_latency if slow else random.uniform(0, 2 * options.latency))
+            model = request.get('model', 'fake-model')
+            if not request.get('stream'):
+                self.send_json(200, completion_body(model, options.text))
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for word in options.text.split(' '):
+                chunk = {
+                    'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(options.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor LLM falso para pruebas locales')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='Latencia media en segundos')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fracción de solicitudes lentas')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='Latencia de las solicitudes lentas')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de respuestas 429/503')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After enviado con los 429')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Pausa entre tokens en modo stream')
+    parser.add_argument('--text', default='# Documento\n\nContenido generado por el servidor falso.')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    server = ThreadingHTTPServer((options.host, options.port), make_handler(options))
+    print(f"Servidor LLM falso en http://{options.host}:{options.port}/v1")
+    server.serve_forever()
@@ -1,17 +1,21 @@
 from dotenv import load_dotenv
-from openai import OpenAI
-import json
-import os
-import threading
-import time
-import sys
+import argparse
+import functools
+
+import doc_validation
+import docs_context
+import llm_backends
+import llm_cache
+import llm_stream
+import model_cascade
+import prompt_layout
+import stream_validator
+import tracing
 
 load_dotenv()
 
 def prompt():
-    return """# System:
-    
-# Usando esta estructura y template:
+    return """# Usando esta estructura y template:
 ```
 {template}
 ```
@@ -19,120 +23,84 @@ def prompt():
 ## Usando el template y estos valores:
 Nombre Proyecto: {project_name}
 Repositorio: {repository}
-```json
-{package}
-```
-
-## Para una estructura de archivos:
-```
-{directory_tree}
-```
 
 ### Actualiza la guía de contribución
 """
 
-event = False
+# Backend definido en llm_backends.py (se puede cambiar con DOCS_LLM_BACKEND)
+BACKEND = "openai"
+REPOSITORY_URL = 'git@github.com:Cencosud-xlabs/shopping-app.git'  # Puedes ajustar esto si es necesario
 
-def llm_guide_content(template, project_name, repository_url, package_json, directory_tree):
-    global event
-    client = OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),  # This is the default and can be omitted
-    )
+
+def build_messages(template, project_name, repository_url, package_json, directory_tree, model):
+    """Contexto estable (package.json y árbol) primero e instrucciones de la guía al final."""
     prompt_value = prompt().format(
         template=template, 
         project_name=project_name, 
         repository=repository_url, 
-        package=package_json, 
-        directory_tree=directory_tree
     )
+    return prompt_layout.build_messages(model, prompt_value, directory_tree, package_json=package_json)
+
+
+def llm_guide_content(template, project_name, repository_url, package_json, directory_tree, output_path=None, stream=False,
+                      cascade=False):
+    client = llm_backends.get_client(BACKEND)
+    backend = llm_backends.get_backend(BACKEND)
+    model = backend.model
+    messages = build_messages(template, project_name, repository_url, package_json, directory_tree, model)
 
     print("Procesando... Esto puede tomar unos segundos:")  # Mensaje inicial
-    start_time = time.time()  # Inicia el contador de tiempo
-
-    # Función para mostrar logs periódicos
-    def log_progress():
-        while not event.is_set():
-            elapsed_time = time.time() - start_time
-            print(f"Procesando: {int(elapsed_time)}s...")
-            time.sleep(1)
-
-    # Evento para detener los logs
-    # event = threading.Event()
-    # log_thread = threading.Thread(target=log_progress)
-    # log_thread.start()
-
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": "Eres un generador de contenido documental para un proyecto, `dado un template + valores => Actualizas al documento`"
-            },
-            {
-                "role": "user",
-                "content": prompt_value,
-            }
-        ],
-        model="gpt-4o",
-    )
 
-    print(chat_completion)
+    if cascade:
+        # El borrador se valida completo antes de aceptarlo, por eso sin streaming
+        return model_cascade.cascade_completion(
+            client, messages, backend, validate=doc_validation.validator(template, directory_tree),
+            label='Guía de contribución',
+        )
+    if stream:
+        # Se corta al completar el template y se reintenta solo la sección que se desvía
+        completion = functools.partial(
+            stream_validator.validated_stream_completion, output_path=output_path, template=template
+        )
+    else:
+        completion = llm_cache.cached_completion
+    content = completion(
+        client,
+        messages=messages,
+        model=model,
+    )
 
-    return chat_completion.choices[0].message.content
+    return content
     
 
 
-def generate_guide():
-    package_json = ""
-    with open('../package.json', 'r', encoding='utf-8') as f:
-        package_json = f.read()
-        package = json.loads(package_json)  # Parse the raw string into a JSON object if needed
+def generate_guide(stream=False, context=None, cascade=False):
+    # El contexto (package.json y árbol) puede venir ya cargado desde build_docs.py
+    context = context or docs_context.load_context()
+    package_json = context['package_json']
 
-    project_name = package.get('name', 'Nombre del Proyecto')
-    project_version = package.get('version', '1.0.0')
-    project_description = package.get('description', '')
-    repository_url = 'git@github.com:Cencosud-xlabs/shopping-app.git'  # Puedes ajustar esto si es necesario
+    project_name = context['project_name']
+    project_version = context['project_version']
+    project_description = context['project_description']
+    repository_url = REPOSITORY_URL
 
-    directory_tree = generate_directory_tree()
-    template = generate_template(project_name, project_version, repository_url, directory_tree)
+    directory_tree = context['directory_tree']
+    template = generate_template(project_name, project_version, repository_url)
 
-    with open('./Guía de Contribución y Arquitectura del Proyecto.md', 'w', encoding='utf-8') as f:
-        print('Started.')
-        chat_completion = llm_guide_content(template, project_name, repository_url, package_json, directory_tree)
-        f.write(chat_completion)
+    output_path = './Guía de Contribución y Arquitectura del Proyecto.md'
+    print('Started.')
+    chat_completion = llm_guide_content(
+        template, project_name, repository_url, package_json, directory_tree, output_path, stream, cascade
+    )
+    if not stream or cascade:
+        llm_stream.write_atomic(output_path, chat_completion)
     print('Finished.')
-    event.set()
-
-
-
-def generate_directory_tree():
-    # Ignorar ciertas carpetas
-    ignore_dirs = {'.git', 'node_modules', '__pycache__', 'android', 'ios', 'fonts'}
-    structure = []
-
-    start_path = '../'
-    base_level = start_path.rstrip(os.sep).count(os.sep)
-
-    for root, dirs, files in os.walk(start_path):
-        # Filtrar directorios ignorados
-        dirs[:] = [d for d in dirs if d not in ignore_dirs and not d.startswith('.')]
-        
-        current_level = root.rstrip(os.sep).count(os.sep) - base_level
-        if current_level >= 4:
-            # No descender más allá del segundo nivel
-            dirs[:] = []
-            continue
-
-        indent = '    ' * current_level
-        folder = os.path.basename(root)
-        structure.append(f"{indent}├── {folder}/")
+    return output_path
 
-        subindent = '    ' * (current_level + 1)
-        for f in files:
-            structure.append(f"{subindent}├── {f}")
 
-    return '\n'.join(structure)
 
-def generate_template(project_name, project_version, repository_url, directory_tree):
+def generate_template(project_name, project_version, repository_url):
+    # El árbol ya va en el contexto (mensaje de sistema): no se repite en el template
     template = f"""# Guía de Contribución y Arquitectura del Proyecto
 ¡Bienvenido al proyecto **{project_name} v{project_version}**! Este documento tiene como objetivo proporcionar una visión general de la arquitectura, el stack tecnológico y las pautas para contribuir. Si eres nuevo en el proyecto, esta guía te ayudará a comprender cómo está estructurado y cómo puedes participar de manera efectiva.
 
@@ -168,7 +136,7 @@ Seguimos una arquitectura hexagonal (Ports and Adapters) para asegurar el desaco
 
 ## Estructura de Carpetas
 
-{directory_tree}
+[Árbol de directorios del contexto (directory_tree), en un bloque de código]
 
 ## Descripción de las Capas
 - **Domain**: Contiene las entidades y puertos (interfaces) que definen la lógica de negocio.
@@ -294,4 +262,12 @@ Si tienes preguntas, problemas o sugerencias, por favor abre un Issue en el repo
     return template
 
 if __name__ == '__main__':
-    generate_guide()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Genera la guía de contribución')
+    llm_cache.add_arguments(parser)
+    llm_stream.add_arguments(parser)
+    model_cascade.add_arguments(parser)
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    if not llm_cache.apply_arguments(args):
+        generate_guide(stream=args.stream, cascade=args.cascade)
+        tracing.finish(args.trace)
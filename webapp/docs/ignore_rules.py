@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+
+# Reglas de exclusión para los recorridos del repositorio: .gitignore,
+# .dockerignore y .docsignore (propio de la documentación) de la raíz del
+# proyecto se compilan una sola vez en expresiones regulares.
+#
+# Se soporta el subconjunto habitual de la sintaxis de .gitignore:
+# comentarios, negación con '!', patrones solo de directorio ('dir/'),
+# anclados a la raíz (con '/') y comodines '*', '?', '[...]' y '**'.
+#
+# En .dockerignore los patrones son siempre relativos a la raíz (como los
+# interpreta Docker), así que se anclan todos: 'dist' no ignora 'src/dist'.
+#
+# Solo se leen los archivos de la raíz: los .gitignore de subcarpetas no se
+# aplican (sus reglas pueden repetirse en .docsignore con la ruta completa).
+IGNORE_FILES = ('.gitignore', '.dockerignore', '.docsignore')
+# Archivos cuyos patrones se anclan a la raíz aunque no tengan '/'
+ANCHORED_IGNORE_FILES = ('.dockerignore',)
+
+# Archivos que se consideran grandes para el árbol y el volcado de código
+MAX_FILE_BYTES = int(os.environ.get('DOCS_MAX_FILE_BYTES', 256 * 1024))
+SNIFF_BYTES = 1024
+
+# Extensiones conocidas: se clasifican sin leer el archivo
+TEXT_EXTENSIONS = {
+    '.ts', '.tsx', '.js', '.jsx', '.cjs', '.mjs', '.json', '.md', '.css', '.scss', '.html',
+    '.yml', '.yaml', '.py', '.sh', '.txt', '.feature', '.njk', '.conf', '.svg', '.env',
+}
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.ico', '.webp', '.pdf', '.zip', '.gz', '.eot', '.ttf',
+    '.woff', '.woff2', '.otf', '.mp3', '.mp4', '.sqlite', '.db', '.so', '.pyc',
+}
+
+
+def translate(pattern):
+    """Traduce un patrón glob de .gitignore a una expresión regular."""
+    i, n = 0, len(pattern)
+    regex = ''
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            regex += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif c == '*':
+            regex += '[^/]*'
+            i += 1
+        elif c == '?':
+            regex += '[^/]'
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex += re.escape(c)
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex += f'[{body}]'
+                i = end + 1
+        else:
+            regex += re.escape(c)
+            i += 1
+    return regex
+
+
+def parse_rule(line):
+    line = line.rstrip('\n').rstrip()
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    if line.startswith('\\'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    # Un '/' al inicio o en medio ancla el patrón a la raíz; si no, aplica en cualquier nivel
+    anchored = '/' in line
+    line = line.lstrip('/')
+    prefix = '' if anchored else '(?:.*/)?'
+    return negated, dir_only, re.compile(f'^{prefix}{translate(line)}$')
+
+
+class IgnoreMatcher:
+    def __init__(self, lines):
+        self.rules = [rule for rule in map(parse_rule, lines) if rule]
+        self.fingerprint = hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+        # Sin negaciones basta con una sola expresión por tipo de entrada
+        self.simple = not any(negated for negated, _, _ in self.rules)
+        if self.simple:
+            self.any_regex = self._combine([regex for _, dir_only, regex in self.rules if not dir_only])
+            self.dir_regex = self._combine([regex for _, _, regex in self.rules])
+
+    @staticmethod
+    def _combine(regexes):
+        if not regexes:
+            return None
+        return re.compile('|'.join(f'(?:{regex.pattern})' for regex in regexes))
+
+    def ignored(self, rel_path, is_dir):
+        if self.simple:
+            regex = self.dir_regex if is_dir else self.any_regex
+            return bool(regex and regex.match(rel_path))
+        # La última regla que coincide es la que decide
+        for negated, dir_only, regex in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negated
+        return False
+
+
+def anchor_rule(line):
+    """Agrega el '/' inicial que ancla el patrón a la raíz (respetando '!' y los comentarios)."""
+    stripped = line.strip()
+    if not stripped or stripped.startswith('#'):
+        return line
+    negated = stripped.startswith('!')
+    if negated:
+        stripped = stripped[1:]
+    return ('!' if negated else '') + '/' + stripped.lstrip('/')
+
+
+def load_matcher(root, ignore_files=IGNORE_FILES):
+    lines = []
+    for name in ignore_files:
+        try:
+            with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                file_lines = f.read().splitlines()
+        except (FileNotFoundError, UnicodeDecodeError):
+            continue
+        if name in ANCHORED_IGNORE_FILES:
+            file_lines = [anchor_rule(line) for line in file_lines]
+        lines.extend(file_lines)
+    return IgnoreMatcher(lines)
+
+
+def is_binary(path, ext=None):
+    """Detección barata: por extensión conocida o buscando un byte NUL al inicio."""
+    ext = (ext if ext is not None else os.path.splitext(path)[1]).lower()
+    if ext in TEXT_EXTENSIONS:
+        return False
+    if ext in BINARY_EXTENSIONS:
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return b'\0' in f.read(SNIFF_BYTES)
+    except OSError:
+        return False
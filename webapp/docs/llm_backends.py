@@ -0,0 +1,296 @@
+from dataclasses import dataclass, fields, replace
+import asyncio
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Backends de LLM configurables. Cada generador pide un backend por nombre
+# ('groq' para README y Arquitectura, 'openai' para la guía) y todos
+# comparten un cliente httpx con pool de conexiones por proceso, de modo
+# que las conexiones TCP/TLS se reutilizan entre generaciones.
+#
+# Los valores por defecto se pueden sobrescribir con ./llm_backends.json
+# ({"groq": {"model": "...", "timeout": 120, "rate_limit": 30}, ...}) o con variables de entorno
+# que aplican a todos los backends:
+#   DOCS_LLM_BACKEND          usa este backend en lugar del pedido (p.ej. 'mock')
+#   DOCS_LLM_MODEL            modelo
+#   DOCS_LLM_DRAFT_MODEL      modelo de borrador para --cascade
+#   DOCS_LLM_BASE_URL         URL base
+#   DOCS_LLM_TIMEOUT          timeout en segundos
+#   DOCS_LLM_MAX_CONNECTIONS  conexiones máximas del pool
+#   DOCS_LLM_HTTP2            '1' para usar HTTP/2 (requiere el paquete h2)
+#
+# El backend 'mock' no usa la red: responde en proceso con respuestas
+# enlatadas (DOCS_LLM_MOCK_RESPONSES, un JSON con una lista de textos o un
+# objeto {modelo: [textos]} para responder distinto a cada modelo) y
+# una latencia configurable (DOCS_LLM_MOCK_LATENCY, DOCS_LLM_MOCK_TOKEN_DELAY).
+# Simula además la caché de prompts de los proveedores: informa en
+# usage.prompt_tokens_details.cached_tokens el prefijo (en bloques de
+# MOCK_CACHE_BLOCK tokens) que comparte con las últimas solicitudes.
+CONFIG_PATH = os.environ.get('DOCS_LLM_CONFIG', './llm_backends.json')
+
+
+@dataclass(frozen=True)
+class Backend:
+    name: str
+    model: str
+    base_url: str = None
+    api_key_env: str = None
+    timeout: float = 600.0
+    max_connections: int = 10
+    http2: bool = False
+    # Solicitudes por minuto que admite el proveedor (lo respeta docs_batch.py)
+    rate_limit: float = None
+    # Modelo chico para los borradores de la cascada (ver model_cascade.py)
+    draft_model: str = None
+
+
+DEFAULT_BACKENDS = {
+    'groq': Backend(
+        'groq', 'qwen-2.5-coder-32b', 'https://api.groq.com/openai/v1', 'GROQ_API_KEY', rate_limit=30,
+        draft_model='llama-3.1-8b-instant',
+    ),
+    'openai': Backend('openai', 'gpt-4o', None, 'OPENAI_API_KEY', draft_model='gpt-4o-mini'),
+    'mock': Backend('mock', 'mock-model', 'http://mock.local/v1', None, draft_model='mock-draft'),
+}
+
+MOCK_RESPONSES = ['# Documento\n\nContenido generado por el backend mock.\n']
+MOCK_LATENCY = float(os.environ.get('DOCS_LLM_MOCK_LATENCY', 0.0))
+MOCK_TOKEN_DELAY = float(os.environ.get('DOCS_LLM_MOCK_TOKEN_DELAY', 0.0))
+MOCK_CACHE_BLOCK = 128
+MOCK_CACHE_SIZE = 16
+
+_clients = {}
+# Clientes async por event loop: la entrada desaparece con el loop
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+_mock_cycles = {}
+_mock_prompts = []
+_mock_prompts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(path=CONFIG_PATH):
+    """
+    Lee 'path' una sola vez por proceso y valida que cada backend use solo
+    campos de Backend; si no, ValueError con las claves desconocidas.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: JSON inválido ({e})")
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: se espera un objeto {{backend: {{campo: valor}}}}")
+    valid = {field.name for field in fields(Backend)} - {'name'}
+    for name, values in config.items():
+        if not isinstance(values, dict):
+            raise ValueError(f"{path}: la configuración de '{name}' debe ser un objeto")
+        unknown = sorted(set(values) - valid)
+        if unknown:
+            raise ValueError(
+                f"{path}: claves desconocidas para '{name}': {', '.join(unknown)} "
+                f"(válidas: {', '.join(sorted(valid))})"
+            )
+    return config
+
+
+def get_backend(name):
+    name = os.environ.get('DOCS_LLM_BACKEND') or name
+    config = load_config()
+    backend = DEFAULT_BACKENDS.get(name) or Backend(name, config.get(name, {}).get('model', name))
+    backend = replace(backend, **config.get(name, {}))
+    overrides = {
+        'model': os.environ.get('DOCS_LLM_MODEL'),
+        'draft_model': os.environ.get('DOCS_LLM_DRAFT_MODEL'),
+        'base_url': os.environ.get('DOCS_LLM_BASE_URL'),
+        'timeout': os.environ.get('DOCS_LLM_TIMEOUT') and float(os.environ['DOCS_LLM_TIMEOUT']),
+        'max_connections': os.environ.get('DOCS_LLM_MAX_CONNECTIONS') and int(os.environ['DOCS_LLM_MAX_CONNECTIONS']),
+        'http2': os.environ.get('DOCS_LLM_HTTP2') and os.environ['DOCS_LLM_HTTP2'].lower() in ('1', 'on', 'true', 'yes'),
+    }
+    return replace(backend, **{key: value for key, value in overrides.items() if value})
+
+
+def _limits(backend):
+    return httpx.Limits(max_connections=backend.max_connections, max_keepalive_connections=backend.max_connections)
+
+
+def _http2(backend):
+    if not backend.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("HTTP/2 solicitado pero el paquete 'h2' no está instalado; se usa HTTP/1.1")
+        return False
+
+
+def _mock_text(model):
+    with _clients_lock:
+        if not _mock_cycles:
+            responses = MOCK_RESPONSES
+            if os.environ.get('DOCS_LLM_MOCK_RESPONSES'):
+                with open(os.environ['DOCS_LLM_MOCK_RESPONSES'], 'r', encoding='utf-8') as f:
+                    responses = json.load(f)
+            if not isinstance(responses, dict):
+                responses = {None: responses}
+            _mock_cycles.update((name, itertools.cycle(texts)) for name, texts in responses.items())
+        cycle = _mock_cycles.get(model) or _mock_cycles.get(None) or next(iter(_mock_cycles.values()))
+        return next(cycle)
+
+
+def _common_prefix(a, b):
+    """Largo del prefijo común, por búsqueda binaria (las comparaciones de slices son en C)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _mock_cached_tokens(prompt):
+    """Tokens (palabras) del prompt cuyo prefijo ya se vio en una solicitud reciente."""
+    with _mock_prompts_lock:
+        shared = max((_common_prefix(prompt, previous) for previous in _mock_prompts), default=0)
+        _mock_prompts.append(prompt)
+        del _mock_prompts[:-MOCK_CACHE_SIZE]
+    tokens = len(prompt[:shared].split())
+    return tokens - tokens % MOCK_CACHE_BLOCK
+
+
+def _mock_payload(request):
+    body = json.loads(request.content or b'{}')
+    text = _mock_text(body.get('model'))
+    completion_tokens = len(text.split())
+    contents = [str(message.get('content', '')) for message in body.get('messages', [])]
+    prompt_tokens = sum(len(content.split()) for content in contents)
+    cached_tokens = _mock_cached_tokens('\n'.join(contents))
+    return body, text, {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'prompt_tokens_details': {'cached_tokens': cached_tokens},
+    }
+
+
+def _mock_completion(body, text, usage):
+    return {
+        'id': 'chatcmpl-mock', 'object': 'chat.completion', 'created': int(time.time()),
+        'model': body.get('model', 'mock-model'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+        'usage': usage,
+    }
+
+
+def _mock_chunks(body, text, usage):
+    words = text.split(' ')
+    for i, word in enumerate(words):
+        chunk = {
+            'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': body.get('model', 'mock-model'),
+            'choices': [{'index': 0, 'delta': {'content': word if i == len(words) - 1 else word + ' '}, 'finish_reason': None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+    final = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+             'model': body.get('model', 'mock-model'), 'choices': [], 'usage': usage}
+    yield f"data: {json.dumps(final)}\n\n".encode('utf-8')
+    yield b"data: [DONE]\n\n"
+
+
+def _mock_handler(request):
+    body, text, usage = _mock_payload(request)
+    time.sleep(MOCK_LATENCY)
+    if not body.get('stream'):
+        return httpx.Response(200, json=_mock_completion(body, text, usage))
+
+    def stream():
+        for chunk in _mock_chunks(body, text, usage):
+            time.sleep(MOCK_TOKEN_DELAY)
+            yield chunk
+    return httpx.Response(200, headers={'Content-Type': 'text/event-stream'}, content=stream())
+
+
+async def _mock_handler_async(request):
+    body, text, usage = _mock_payload(request)
+    await asyncio.sleep(MOCK_LATENCY)
+    if not body.get('stream'):
+        return httpx.Response(200, json=_mock_completion(body, text, usage))
+
+    async def stream():
+        for chunk in _mock_chunks(body, text, usage):
+            await asyncio.sleep(MOCK_TOKEN_DELAY)
+            yield chunk
+    return httpx.Response(200, headers={'Content-Type': 'text/event-stream'}, content=stream())
+
+
+def _openai_kwargs(backend):
+    return {
+        'base_url': backend.base_url,
+        'api_key': os.environ.get(backend.api_key_env) if backend.api_key_env else 'mock',
+        'max_retries': 0,  # Los reintentos los maneja llm_retry
+        'timeout': backend.timeout,
+    }
+
+
+def get_client(name):
+    """Cliente OpenAI síncrono compartido para el backend 'name'."""
+    backend = get_backend(name)
+    key = ('sync', backend)
+    with _clients_lock:
+        if key not in _clients:
+            if backend.name == 'mock':
+                http_client = httpx.Client(transport=httpx.MockTransport(_mock_handler))
+            else:
+                http_client = httpx.Client(limits=_limits(backend), timeout=backend.timeout, http2=_http2(backend))
+            _clients[key] = OpenAI(http_client=http_client, **_openai_kwargs(backend))
+        return _clients[key]
+
+
+def get_async_client(name):
+    """
+    Cliente AsyncOpenAI compartido para el backend 'name'. Un AsyncClient de
+    httpx queda ligado a su event loop, por eso se guarda uno por loop; se
+    cierran con close_async_clients() (ver run()).
+    """
+    backend = get_backend(name)
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if backend not in clients:
+            if backend.name == 'mock':
+                http_client = httpx.AsyncClient(transport=httpx.MockTransport(_mock_handler_async))
+            else:
+                http_client = httpx.AsyncClient(limits=_limits(backend), timeout=backend.timeout, http2=_http2(backend))
+            clients[backend] = AsyncOpenAI(http_client=http_client, **_openai_kwargs(backend))
+        return clients[backend]
+
+
+async def close_async_clients():
+    """Cierra los clientes async creados en el loop actual."""
+    with _clients_lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+def run(main):
+    """asyncio.run(main), cerrando al terminar los clientes async que se crearon en el loop."""
+    async def runner():
+        try:
+            return await main
+        finally:
+            await close_async_clients()
+    return asyncio.run(runner())
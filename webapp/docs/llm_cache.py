@@ -0,0 +1,165 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import llm_retry
+import tracing
+
+# Caché persistente de respuestas del LLM, direccionada por contenido:
+# la clave es un hash del modelo, los mensajes y max_tokens, de modo que
+# si Template.md, repo.md, package.json y el árbol no cambian, la
+# respuesta se devuelve desde disco en milisegundos.
+CACHE_PATH = os.environ.get('DOCS_LLM_CACHE_PATH', './.llm_cache.sqlite')
+MAX_AGE_SECONDS = int(os.environ.get('DOCS_LLM_CACHE_MAX_AGE', 30 * 24 * 3600))
+MAX_BYTES = int(os.environ.get('DOCS_LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+# Se puede desactivar la lectura de caché desde la línea de comandos
+# (--no-cache) o con DOCS_LLM_CACHE=off
+bypass = os.environ.get('DOCS_LLM_CACHE', '').lower() in ('0', 'off', 'false', 'no')
+
+
+def cache_key(model, messages, max_tokens):
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'max_tokens': max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _connect(path=None):
+    # 'with conn' solo confirma la transacción: quien la abre debe cerrarla (contextlib.closing)
+    conn = sqlite3.connect(path or CACHE_PATH)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            content TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )"""
+    )
+    return conn
+
+
+def get(key, path=None):
+    with contextlib.closing(_connect(path)) as conn, conn:
+        row = conn.execute(
+            'SELECT content, created_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        if time.time() - created_at > MAX_AGE_SECONDS:
+            conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+        return content
+
+
+def put(key, model, content, path=None):
+    now = time.time()
+    with contextlib.closing(_connect(path)) as conn, conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (key, model, content, size, created_at, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, model, content, len(content.encode('utf-8')), now, now),
+        )
+        evict(conn)
+
+
+def evict(conn):
+    # Primero se eliminan las entradas vencidas y luego las menos usadas
+    # hasta quedar bajo el tamaño máximo
+    conn.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - MAX_AGE_SECONDS,))
+    total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_used ASC').fetchall():
+        if total <= MAX_BYTES:
+            break
+        conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+        total -= size
+
+
+def purge(path=None):
+    with contextlib.closing(_connect(path)) as conn, conn:
+        removed = conn.execute('DELETE FROM responses').rowcount
+    with contextlib.closing(_connect(path)) as conn, conn:
+        conn.execute('VACUUM')
+    return removed
+
+
+def cached_completion(client, messages, model, max_tokens=None):
+    """
+    Envuelve client.chat.completions.create: si existe una respuesta para
+    la misma combinación (modelo, mensajes, max_tokens) se devuelve sin
+    llamar a la API; si no, se llama y se guarda el contenido.
+    """
+    key = cache_key(model, messages, max_tokens)
+    with tracing.span('request', model=model) as span:
+        content = lookup(key)
+        if content is not None:
+            span.set(cached=True)
+            return content
+
+        chat_completion = llm_retry.create(client.chat.completions.create, **request_kwargs(messages, model, max_tokens))
+        span.set(**tracing.usage_args(chat_completion.usage))
+    content = chat_completion.choices[0].message.content
+    put(key, model, content)
+    return content
+
+
+async def cached_completion_async(client, messages, model, max_tokens=None):
+    """Versión de cached_completion para un cliente AsyncOpenAI."""
+    key = cache_key(model, messages, max_tokens)
+    with tracing.span('request', model=model) as span:
+        content = lookup(key)
+        if content is not None:
+            span.set(cached=True)
+            return content
+
+        chat_completion = await llm_retry.create_async(
+            client.chat.completions.create, **request_kwargs(messages, model, max_tokens)
+        )
+        span.set(**tracing.usage_args(chat_completion.usage))
+    content = chat_completion.choices[0].message.content
+    put(key, model, content)
+    return content
+
+
+def lookup(key):
+    if bypass:
+        return None
+    content = get(key)
+    if content is not None:
+        print(f"Respuesta obtenida desde la caché ({key[:12]})")
+    return content
+
+
+def request_kwargs(messages, model, max_tokens=None, **extra):
+    kwargs = {'messages': messages, 'model': model, **extra}
+    if max_tokens is not None:
+        kwargs['max_tokens'] = max_tokens
+    return kwargs
+
+
+def add_arguments(parser):
+    parser.add_argument('--no-cache', action='store_true', help='Ignora la caché de respuestas del LLM')
+    parser.add_argument('--purge-cache', action='store_true', help='Vacía la caché de respuestas del LLM y termina')
+
+
+def apply_arguments(args):
+    """Aplica los flags de caché. Devuelve True si el script debe terminar."""
+    global bypass
+    if args.no_cache:
+        bypass = True
+    if args.purge_cache:
+        removed = purge()
+        print(f"Caché vaciada: {removed} respuestas eliminadas de {os.path.abspath(CACHE_PATH)}")
+        return True
+    return False
@@ -0,0 +1,241 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import deque
+from email.utils import parsedate_to_datetime
+import argparse
+import asyncio
+import os
+import re
+import threading
+import time
+
+import openai
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# Reintentos para las llamadas al LLM: respeta Retry-After y los headers de
+# rate limit de Groq/OpenAI, y si no hay headers usa backoff exponencial con
+# jitter. Opcionalmente hace "hedging": si una solicitud tarda más que el
+# percentil DOCS_LLM_HEDGE_PERCENTILE de las latencias observadas, lanza una
+# segunda y se queda con la primera que termine.
+#
+# Configuración por variables de entorno:
+#   DOCS_LLM_MAX_ATTEMPTS    intentos totales (5)
+#   DOCS_LLM_BACKOFF_BASE    base del backoff en segundos (1)
+#   DOCS_LLM_BACKOFF_MAX     espera máxima entre intentos en segundos (60)
+#   DOCS_LLM_HEDGE           '1' para activar el hedging
+#   DOCS_LLM_HEDGE_PERCENTILE percentil de latencia que dispara el hedge (95)
+#   DOCS_LLM_HEDGE_AFTER     umbral en segundos mientras no hay suficientes muestras (30)
+MAX_ATTEMPTS = int(os.environ.get('DOCS_LLM_MAX_ATTEMPTS', 5))
+BACKOFF_BASE = float(os.environ.get('DOCS_LLM_BACKOFF_BASE', 1))
+BACKOFF_MAX = float(os.environ.get('DOCS_LLM_BACKOFF_MAX', 60))
+HEDGE = os.environ.get('DOCS_LLM_HEDGE', '').lower() in ('1', 'on', 'true', 'yes')
+HEDGE_PERCENTILE = float(os.environ.get('DOCS_LLM_HEDGE_PERCENTILE', 95))
+HEDGE_AFTER = float(os.environ.get('DOCS_LLM_HEDGE_AFTER', 30))
+HEDGE_MIN_SAMPLES = 10
+
+# Latencias de las últimas solicitudes exitosas
+_latencies = deque(maxlen=200)
+_latencies_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-hedge')
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def is_retryable(exception):
+    if isinstance(exception, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(exception, openai.APIStatusError):
+        return exception.status_code == 429 or exception.status_code >= 500
+    return False
+
+
+def parse_duration(value):
+    """Interpreta '20', '1.5s', '6m0s' o '250ms' como segundos."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(exception):
+    """Segundos que pide esperar el servidor, según sus headers, o None."""
+    response = getattr(exception, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    if headers.get('retry-after'):
+        seconds = parse_duration(headers['retry-after'])
+        if seconds is not None:
+            return seconds
+        try:
+            return max(parsedate_to_datetime(headers['retry-after']).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+    resets = [
+        parse_duration(headers[name])
+        for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')
+        if headers.get(name)
+    ]
+    resets = [seconds for seconds in resets if seconds is not None]
+    return max(resets) if resets else None
+
+
+_exponential = wait_random_exponential(multiplier=BACKOFF_BASE, max=BACKOFF_MAX)
+
+
+def wait_strategy(retry_state):
+    delay = retry_after(retry_state.outcome.exception())
+    if delay is None:
+        return _exponential(retry_state)
+    return min(delay, BACKOFF_MAX)
+
+
+def log_retry(retry_state):
+    exception = retry_state.outcome.exception()
+    print(
+        f"Reintento {retry_state.attempt_number}/{MAX_ATTEMPTS - 1} en "
+        f"{retry_state.next_action.sleep:.1f}s: {type(exception).__name__}: {exception}"
+    )
+
+
+def retry_options():
+    return dict(
+        retry=retry_if_exception(is_retryable),
+        wait=wait_strategy,
+        stop=stop_after_attempt(MAX_ATTEMPTS),
+        before_sleep=log_retry,
+        reraise=True,
+    )
+
+
+def record_latency(seconds):
+    with _latencies_lock:
+        _latencies.append(seconds)
+
+
+def hedge_threshold():
+    if not HEDGE:
+        return None
+    with _latencies_lock:
+        samples = sorted(_latencies)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_AFTER
+    index = min(int(len(samples) * HEDGE_PERCENTILE / 100), len(samples) - 1)
+    return samples[index]
+
+
+def _timed(create, kwargs):
+    start_time = time.perf_counter()
+    result = create(**kwargs)
+    record_latency(time.perf_counter() - start_time)
+    return result
+
+
+def _hedged(create, kwargs):
+    threshold = hedge_threshold()
+    if threshold is None:
+        return _timed(create, kwargs)
+    first = _hedge_executor.submit(_timed, create, kwargs)
+    done, _ = wait([first], timeout=threshold)
+    if done:
+        return first.result()
+    print(f"Solicitud lenta (> {threshold:.1f}s): enviando solicitud de respaldo")
+    pending = {first, _hedge_executor.submit(_timed, create, kwargs)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # La otra solicitud sigue en segundo plano; su resultado se descarta
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def create(create_fn, **kwargs):
+    """Llama a create_fn(**kwargs) con reintentos y hedging (si está activo)."""
+    for attempt in Retrying(**retry_options()):
+        with attempt:
+            # Un stream no se puede duplicar: solo se reintenta
+            if kwargs.get('stream'):
+                return create_fn(**kwargs)
+            return _hedged(create_fn, kwargs)
+
+
+async def _timed_async(create_fn, kwargs):
+    start_time = time.perf_counter()
+    result = await create_fn(**kwargs)
+    record_latency(time.perf_counter() - start_time)
+    return result
+
+
+async def _hedged_async(create_fn, kwargs):
+    threshold = hedge_threshold()
+    if threshold is None:
+        return await _timed_async(create_fn, kwargs)
+    first = asyncio.ensure_future(_timed_async(create_fn, kwargs))
+    done, _ = await asyncio.wait({first}, timeout=threshold)
+    if done:
+        return first.result()
+    print(f"Solicitud lenta (> {threshold:.1f}s): enviando solicitud de respaldo")
+    pending = {first, asyncio.ensure_future(_timed_async(create_fn, kwargs))}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def create_async(create_fn, **kwargs):
+    """Versión de create para clientes AsyncOpenAI."""
+    async for attempt in AsyncRetrying(**retry_options()):
+        with attempt:
+            if kwargs.get('stream'):
+                return await create_fn(**kwargs)
+            return await _hedged_async(create_fn, kwargs)
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+
+if __name__ == '__main__':
+    # Mide la latencia de cola contra un servidor (por ejemplo fake_llm_server.py):
+    #   python llm_retry.py --base-url http://127.0.0.1:8765/v1 --requests 200 --hedge
+    parser = argparse.ArgumentParser(description='Mide latencias p50/p95/p99 con reintentos y hedging')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8765/v1')
+    parser.add_argument('--model', default='fake-model')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--hedge', action='store_true')
+    args = parser.parse_args()
+
+    HEDGE = args.hedge
+    client = openai.OpenAI(base_url=args.base_url, api_key='local', max_retries=0)
+    latencies = []
+    for i in range(args.requests):
+        start_time = time.perf_counter()
+        create(client.chat.completions.create, model=args.model, messages=[{'role': 'user', 'content': f'ping {i}'}])
+        latencies.append(time.perf_counter() - start_time)
+    print(
+        f"{args.requests} solicitudes (hedge={'on' if HEDGE else 'off'}): "
+        f"p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s "
+        f"p99={percentile(latencies, 99):.3f}s max={max(latencies):.3f}s"
+    )
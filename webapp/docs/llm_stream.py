@@ -0,0 +1,128 @@
+import contextlib
+import os
+import stat
+import tempfile
+import time
+
+import llm_cache
+import llm_retry
+import tracing
+
+# Modo streaming: los tokens se escriben en un archivo temporal junto al
+# documento de salida a medida que llegan, y al terminar se renombra de
+# forma atómica. Si la generación falla, el documento anterior queda intacto.
+
+# mkstemp crea el temporal con modo 0600; al reemplazar se le da el modo del
+# documento anterior o el que tendría con open() (0666 menos la umask). La
+# umask solo se puede leer cambiándola, por eso se lee una vez al importar.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def _output_mode(output_path):
+    try:
+        return stat.S_IMODE(os.stat(output_path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+@contextlib.contextmanager
+def partial_file(output_path):
+    """
+    Archivo temporal junto a 'output_path' que reemplaza al documento (con
+    sus permisos) al salir sin error; si hay una excepción se elimina.
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.partial')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+        os.chmod(tmp_path, _output_mode(output_path))
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_atomic(output_path, content):
+    with tracing.span('write', path=output_path) as span:
+        with partial_file(output_path) as f:
+            f.write(content)
+            span.set(bytes=f.tell())
+
+
+def stream_deltas(client, messages, model, max_tokens=None):
+    """
+    Fragmentos de texto de una solicitud con stream=True; registra en la
+    traza el tiempo al primer token, los tokens por segundo y el usage. Si
+    el consumidor deja de iterar (p.ej. stream_validator.py al cortar el
+    documento), se cierra la respuesta y el proveedor deja de generar.
+    """
+    kwargs = llm_cache.request_kwargs(messages, model, max_tokens, stream=True)
+    chunks = size = 0
+    usage = None
+    first_token_at = None
+    start_time = time.perf_counter()
+    with tracing.span('request', model=model, stream=True) as span:
+        stream = llm_retry.create(client.chat.completions.create, **kwargs)
+        completed = False
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, 'usage', None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    print(f"Primer token en {first_token_at - start_time:.2f}s")
+                chunks += 1
+                size += len(delta.encode('utf-8'))
+                yield delta
+            completed = True
+        finally:
+            if not completed and hasattr(stream, 'close'):
+                stream.close()
+            end_time = time.perf_counter()
+            # Si el proveedor no informa usage, cada chunk se cuenta como un token
+            tokens = getattr(usage, 'completion_tokens', None) or chunks
+            if first_token_at is not None:
+                tracing.record('ttft', start_time, first_token_at)
+                tracing.record('generation', first_token_at, end_time, tokens=tokens)
+            span.set(bytes=size, cut=None if completed else True, **tracing.usage_args(usage))
+
+            generation_time = end_time - (first_token_at or start_time)
+            tokens_per_second = tokens / generation_time if generation_time > 0 else float('inf')
+            print(
+                f"Generación {'completada' if completed else 'cortada'} en {end_time - start_time:.2f}s: "
+                f"{tokens} tokens, {tokens_per_second:.1f} tokens/s"
+            )
+
+
+def stream_completion(client, messages, model, output_path, max_tokens=None):
+    """
+    Igual que llm_cache.cached_completion, pero con stream=True: escribe
+    cada fragmento en '<output_path>' (vía archivo temporal) y reporta el
+    tiempo al primer token y los tokens por segundo.
+    """
+    key = llm_cache.cache_key(model, messages, max_tokens)
+    content = llm_cache.lookup(key)
+    if content is not None:
+        write_atomic(output_path, content)
+        return content
+
+    parts = []
+    with partial_file(output_path) as f:
+        for delta in stream_deltas(client, messages, model, max_tokens):
+            f.write(delta)
+            f.flush()
+            parts.append(delta)
+
+    content = ''.join(parts)
+    llm_cache.put(key, model, content)
+    return content
+
+
+def add_arguments(parser):
+    parser.add_argument('--stream', action='store_true', help='Escribe el documento a medida que llegan los tokens')
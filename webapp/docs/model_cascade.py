@@ -0,0 +1,83 @@
+import contextlib
+
+import llm_cache
+import tracing
+
+# Cascada de modelos: cada documento (o sección de Arquitectura.md) se
+# genera primero con el modelo chico del backend (Backend.draft_model) y el
+# borrador se valida sin LLM (doc_validation.py: encabezados, bloques de
+# código, largo y rutas). Solo si la validación falla, o el borrador da
+# error, se vuelve a pedir al modelo grande (Backend.model) con los mismos
+# mensajes.
+#
+#   python build_docs.py build --all --cascade
+#
+# Las dos respuestas quedan en llm_cache con claves distintas (el modelo
+# es parte de la clave): en la próxima ejecución con el mismo contexto el
+# borrador rechazado y la respuesta del modelo grande salen de la caché.
+
+
+def _escalate(backend, label, problems):
+    print(
+        f"{label}: borrador de {backend.draft_model} rechazado ({'; '.join(problems)}); "
+        f"se escala a {backend.model}"
+    )
+
+
+def _check(draft, validate):
+    return validate(draft) if validate is not None else []
+
+
+def cascade_completion(client, messages, backend, max_tokens=None, validate=None, label='Documento'):
+    """
+    Como llm_cache.cached_completion, pero intentando primero con el modelo
+    de borrador. 'validate' recibe el contenido y devuelve la lista de
+    problemas (vacía si se acepta).
+    """
+    with tracing.span('cascade', label=label) as span:
+        if backend.draft_model and backend.draft_model != backend.model:
+            try:
+                draft = llm_cache.cached_completion(client, messages, backend.draft_model, max_tokens)
+                problems = _check(draft, validate)
+            except Exception as e:
+                problems = [f"error: {e}"]
+            if not problems:
+                span.set(model=backend.draft_model, escalated=False)
+                print(f"{label}: borrador de {backend.draft_model} aceptado")
+                return draft
+            _escalate(backend, label, problems)
+        span.set(model=backend.model, escalated=True)
+        return llm_cache.cached_completion(client, messages, backend.model, max_tokens)
+
+
+async def cascade_completion_async(client, messages, backend, max_tokens=None, validate=None, label='Documento',
+                                   limit=None):
+    """
+    Versión de cascade_completion para un cliente AsyncOpenAI. 'limit' es un
+    context manager asíncrono (semáforo o BackendLimit de docs_batch.py) que
+    se toma en cada solicitud, de modo que la escalada cuenta como otra.
+    """
+    limit = limit or contextlib.nullcontext()
+    with tracing.span('cascade', label=label) as span:
+        if backend.draft_model and backend.draft_model != backend.model:
+            try:
+                async with limit:
+                    draft = await llm_cache.cached_completion_async(client, messages, backend.draft_model, max_tokens)
+                problems = _check(draft, validate)
+            except Exception as e:
+                problems = [f"error: {e}"]
+            if not problems:
+                span.set(model=backend.draft_model, escalated=False)
+                print(f"{label}: borrador de {backend.draft_model} aceptado")
+                return draft
+            _escalate(backend, label, problems)
+        span.set(model=backend.model, escalated=True)
+        async with limit:
+            return await llm_cache.cached_completion_async(client, messages, backend.model, max_tokens)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--cascade', action='store_true',
+        help='Genera primero con el modelo de borrador y escala al modelo grande solo si no pasa la validación',
+    )
@@ -0,0 +1,72 @@
+import os
+
+import context_budget
+
+# Armado de los mensajes con un prefijo estable, para aprovechar la caché de
+# prompts de los proveedores (OpenAI, Groq y otros cachean el prefijo común
+# entre solicitudes consecutivas y lo cobran y procesan más barato).
+#
+# Todos los generadores envían primero el mismo mensaje de sistema, en forma
+# canónica y con las partes siempre en el mismo orden:
+#
+#   SYSTEM_PROMPT, package.json, árbol de directorios, código (repo.md)
+#
+# y al final, en el mensaje de usuario, las instrucciones de cada documento
+# (template, nombre del proyecto, etc.). Así README, Arquitectura, la guía y
+# las secciones del map-reduce comparten el prefijo hasta donde su contexto
+# coincide.
+#
+# Para que el recorte del contexto (context_budget) no dependa del largo de
+# cada prompt, el presupuesto se calcula con una reserva fija para las
+# instrucciones y la respuesta; solo si las instrucciones la superan el
+# contexto de ese documento queda distinto.
+SYSTEM_PROMPT = "Eres un generador de contenido documental para un proyecto, `dado un template + valores => Actualizas al documento`"
+INSTRUCTIONS_RESERVE = int(os.environ.get('DOCS_PROMPT_INSTRUCTIONS_RESERVE', 6000))
+# max_tokens mínimo con el que se dimensiona el contexto (el de README y Arquitectura)
+RESPONSE_RESERVE = 8000
+
+
+def canonical(text):
+    """Texto sin '\\r' ni saltos de línea al inicio o al final."""
+    return text.replace('\r\n', '\n').strip('\n')
+
+
+def context_block(directory_tree, repo=None, package_json=None):
+    """Contenido del mensaje de sistema: byte a byte igual para el mismo contexto."""
+    parts = [SYSTEM_PROMPT, '', '### CodeBase']
+    if package_json is not None:
+        parts += ['--- package.json ---', '```json', canonical(package_json), '```']
+    parts += ['--- directory_tree ---', '```', canonical(directory_tree), '```']
+    if repo is not None:
+        parts += ['--- code ---', canonical(repo), '--- /code ---']
+    parts += ['### Use Codebase to update the document', '----']
+    return '\n'.join(parts)
+
+
+def fit(model, instructions, directory_tree, repo=None, package_json=None, max_tokens=None):
+    """
+    Ajusta el árbol y el código a la ventana de 'model'. Se reservan tokens
+    fijos para la respuesta y las instrucciones, de modo que el recorte sea el
+    mismo para todos los documentos que usan el mismo modelo y contexto.
+    """
+    encoding = context_budget.get_encoding(model)
+    reserved = max(INSTRUCTIONS_RESERVE, context_budget.count_tokens(instructions, encoding))
+    return context_budget.fit_context(
+        model, max(max_tokens or 0, RESPONSE_RESERVE) + reserved, context_block('', '', package_json),
+        directory_tree, repo or '',
+    )
+
+
+def build_messages(model, instructions, directory_tree, repo=None, package_json=None, max_tokens=None):
+    """Mensajes [contexto estable, instrucciones] ajustados a la ventana de contexto de 'model'."""
+    fitted_tree, fitted_repo = fit(model, instructions, directory_tree, repo, package_json, max_tokens)
+    return [
+        {
+            "role": "system",
+            "content": context_block(fitted_tree, fitted_repo if repo is not None else None, package_json),
+        },
+        {
+            "role": "user",
+            "content": canonical(instructions),
+        },
+    ]
@@ -1,21 +1,24 @@
 from dotenv import load_dotenv
-from openai import OpenAI
-import json
+import argparse
 import os
-import threading
-import time
-import sys
+import functools
+
+import doc_validation
+import docs_context
+import llm_backends
+import llm_cache
+import llm_stream
+import model_cascade
+import prompt_layout
+import stream_validator
+import tracing
 
 load_dotenv()
 
 def prompt():
-    return """Eres un generador de contenido documental para un proyecto, `dado un template + valores => Actualizas al documento`
-## Usando el template y estos valores:
+    return """## Usando el template y estos valores:
 Nombre Proyecto: {project_name}
 Repositorio: {repository}
-```json
-{package}
-```
 
 # Usando esta codigo, estructura y template:
 ```
@@ -24,131 +27,99 @@ Repositorio: {repository}
 ### Actualiza el documento README.md haciéndolo más detallado e informativo para los usuarios
 """
 
-event = False
+# Backend definido en llm_backends.py (se puede cambiar con DOCS_LLM_BACKEND)
+BACKEND = "groq"
+MAX_TOKENS = 8000
+DEFAULT_REPOSITORY_URL = 'https://github.com/psbarrales/boilerplate-react-app'
 
-def llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo):
-    global event
-    client = OpenAI(
-        base_url = "https://api.groq.com/openai/v1", 
-        api_key=os.environ.get("GROQ_API_KEY"),  # This is the default and can be omitted
-    )
+
+def build_messages(template, project_name, repository_url, package_json, directory_tree, repo, model):
+    """Contexto estable primero e instrucciones del README al final (ver prompt_layout.py)."""
     prompt_value = prompt().format(
         template=template, 
         project_name=project_name, 
         repository=repository_url, 
-        package=package_json, 
     )
+    return prompt_layout.build_messages(model, prompt_value, directory_tree, repo, package_json, MAX_TOKENS)
+
+
+def llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo, output_path=None, stream=False,
+                      cascade=False):
+    client = llm_backends.get_client(BACKEND)
+    backend = llm_backends.get_backend(BACKEND)
+    model = backend.model
+    messages = build_messages(template, project_name, repository_url, package_json, directory_tree, repo, model)
 
     print("Procesando... Esto puede tomar unos segundos:")  # Mensaje inicial
-    start_time = time.time()  # Inicia el contador de tiempo
-
-    # Función para mostrar logs periódicos
-    def log_progress():
-        while not event.is_set():
-            elapsed_time = time.time() - start_time
-            print(f"Procesando: {int(elapsed_time)}s...")
-            time.sleep(1)
-
-    # Evento para detener los logs
-    event = threading.Event()
-    log_thread = threading.Thread(target=log_progress)
-    log_thread.start()
-
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": f"""### CodeBase
---- directory_tree ---
-```
-{directory_tree}
-```
---- code ---
-{repo}
---- /code ---
-### Use Codebase to update the document
-----"""
-            },
-            {
-                "role": "user",
-                "content": prompt_value,
-            }
-        ],
-        model="qwen-2.5-coder-32b",
-        # model="gpt4-o",
-        max_tokens=8000
-    )
 
-    event.set()  # Detener los logs
+    if cascade:
+        # El borrador se valida completo antes de aceptarlo, por eso sin streaming
+        content = model_cascade.cascade_completion(
+            client, messages, backend, MAX_TOKENS, doc_validation.validator(template, directory_tree, repo), 'README.md'
+        )
+    else:
+        if stream:
+            # Se corta al completar el template y se reintenta solo la sección que se desvía
+            completion = functools.partial(
+                stream_validator.validated_stream_completion, output_path=output_path, template=template
+            )
+        else:
+            completion = llm_cache.cached_completion
+        content = completion(
+            client,
+            messages=messages,
+            model=model,
+            max_tokens=MAX_TOKENS
+        )
+
     print("\nGeneración completada!")
 
-    return chat_completion.choices[0].message.content
+    return content
     
 
-def generate_readme():
-    package_json = ""
-    with open('../package.json', 'r', encoding='utf-8') as f:
-        package_json = f.read()
-        package = json.loads(package_json)  # Parse the raw string into a JSON object if needed
+def generate_readme(stream=False, context=None, cascade=False):
+    # El contexto (package.json, árbol y repo.md) puede venir ya cargado desde build_docs.py
+    context = context or docs_context.load_context()
+    package_json = context['package_json']
+    package = context['package']
 
-    project_name = package.get('name', 'Nombre del Proyecto')
-    project_version = package.get('version', '1.0.0')
-    project_description = package.get('description', '')
-    repository_url = package.get('repository', {}).get('url', '') or package.get('repository', '')
-    if not repository_url:
-        repository_url = 'https://github.com/psbarrales/boilerplate-react-app'  # URL predeterminada
+    project_name = context['project_name']
+    project_version = context['project_version']
+    project_description = context['project_description']
+    repository_url = get_repository_url(package)
 
-    directory_tree = generate_directory_tree()
+    directory_tree = context['directory_tree']
+    template = load_template(project_name, project_version, project_description)
     
-    # Cargar la plantilla README.template.md
-    try:
-        with open('./README.template.md', 'r', encoding='utf-8') as f:
-            template = f.read()
-    except FileNotFoundError:
-        print("No se encontró el archivo README.template.md. Usando plantilla predeterminada.")
-        template = generate_default_template(project_name, project_version, project_description)
-    
-    try:
-        with open('./repo.md', 'r', encoding='utf-8') as f:
-            repo = f.read()
-    except FileNotFoundError:
-        print("No se encontró el archivo repo.md. Procediendo sin información del repositorio.")
-        repo = ""
-
-    # Generar el README y guardarlo en la carpeta raíz del proyecto
-    with open('../README.md', 'w', encoding='utf-8') as f:
-        chat_completion = llm_guide_content(template, project_name, repository_url, package_json, directory_tree, repo)
-        f.write(chat_completion)
-        print(f"README.md generado exitosamente en {os.path.abspath('../README.md')}")
-
+    repo = context['repo']
 
-def generate_directory_tree():
-    # Ignorar ciertas carpetas
-    ignore_dirs = {'.git', 'node_modules', '__pycache__', 'android', 'ios', 'fonts'}
-    structure = []
+    # Generar el README y guardarlo en la carpeta raíz del proyecto; el archivo
+    # solo se reemplaza cuando la generación termina
+    output_path = '../README.md'
+    chat_completion = llm_guide_content(
+        template, project_name, repository_url, package_json, directory_tree, repo, output_path, stream, cascade
+    )
+    if not stream or cascade:
+        llm_stream.write_atomic(output_path, chat_completion)
+    print(f"README.md generado exitosamente en {os.path.abspath(output_path)}")
+    return output_path
 
-    start_path = '../'
-    base_level = start_path.rstrip(os.sep).count(os.sep)
 
-    for root, dirs, files in os.walk(start_path):
-        # Filtrar directorios ignorados
-        dirs[:] = [d for d in dirs if d not in ignore_dirs and not d.startswith('.')]
-        
-        current_level = root.rstrip(os.sep).count(os.sep) - base_level
-        if current_level >= 4:
-            # No descender más allá del cuarto nivel
-            dirs[:] = []
-            continue
+def get_repository_url(package, default=DEFAULT_REPOSITORY_URL):
+    repository = package.get('repository', '')
+    repository_url = repository.get('url', '') if isinstance(repository, dict) else repository
+    return repository_url or default  # URL predeterminada
 
-        indent = '    ' * current_level
-        folder = os.path.basename(root)
-        structure.append(f"{indent}├── {folder}/")
 
-        subindent = '    ' * (current_level + 1)
-        for f in files:
-            structure.append(f"{subindent}├── {f}")
+def load_template(project_name, project_version, project_description):
+    # Cargar la plantilla README.template.md
+    try:
+        with open('./README.template.md', 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        print("No se encontró el archivo README.template.md. Usando plantilla predeterminada.")
+        return generate_default_template(project_name, project_version, project_description)
 
-    return '\n'.join(structure)
 
 def generate_default_template(project_name, project_version, project_description):
     template = f"""# {project_name}
@@ -204,4 +175,12 @@ Este proyecto está licenciado bajo [añadir licencia aquí].
     return template
 
 if __name__ == '__main__':
-    generate_readme()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Genera README.md a partir de README.template.md')
+    llm_cache.add_arguments(parser)
+    llm_stream.add_arguments(parser)
+    model_cascade.add_arguments(parser)
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    if not llm_cache.apply_arguments(args):
+        generate_readme(stream=args.stream, cascade=args.cascade)
+        tracing.finish(args.trace)
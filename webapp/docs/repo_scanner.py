@@ -0,0 +1,208 @@
+import json
+import os
+from collections import namedtuple
+
+import ignore_rules
+
+# Índice único del repositorio: un solo recorrido con os.scandir que
+# alimenta tanto el árbol de directorios como el volcado de código de
+# repo_to_markdown. El índice se guarda en disco por directorio; en la
+# siguiente ejecución solo se vuelve a listar un directorio si cambió su
+# mtime (se agregó, borró o renombró algo dentro).
+#
+# Nota: editar un archivo en su lugar no cambia el mtime del directorio,
+# por lo que size/mtime de los archivos pueden quedar desactualizados en
+# el índice cacheado. iter_files y render_tree vuelven a hacer stat de cada
+# archivo (fresh_entry) antes de filtrar los grandes y los binarios.
+#
+# Además de IGNORE_DIRS se respetan .gitignore, .dockerignore y .docsignore
+# de la raíz (ver ignore_rules.py): los directorios ignorados se podan antes
+# de descender, y los archivos grandes o binarios quedan marcados.
+DEFAULT_ROOT = '../'
+INDEX_PATH = './.repo_index.json'
+IGNORE_DIRS = {'.git', 'node_modules', '__pycache__', 'android', 'ios', 'fonts'}
+TREE_MAX_DEPTH = 4
+INDEX_VERSION = 2
+
+Entry = namedtuple('Entry', 'path type size mtime ext depth binary')
+
+# Índices ya cargados en este proceso, por ruta absoluta de la raíz
+_indexes = {}
+
+
+def _list_dir(path, rel, ignore_dirs, matcher):
+    listing = []
+    with os.scandir(path) as it:
+        for entry in it:
+            entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                # Filtrar directorios ignorados
+                if entry.name in ignore_dirs or entry.name.startswith('.'):
+                    continue
+                if matcher.ignored(entry_rel, True):
+                    continue
+                listing.append([entry.name, 'dir', 0, 0, False])
+            else:
+                if matcher.ignored(entry_rel, False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                # Los archivos grandes no se inspeccionan: se excluyen de todos modos
+                binary = stat.st_size <= ignore_rules.MAX_FILE_BYTES and ignore_rules.is_binary(
+                    entry.path, os.path.splitext(entry.name)[1]
+                )
+                listing.append([entry.name, 'file', stat.st_size, stat.st_mtime_ns, binary])
+    listing.sort()
+    return listing
+
+
+def _scan(root, rel, ignore_dirs, matcher, previous, directories):
+    path = os.path.join(root, rel) if rel else root
+    mtime = os.stat(path).st_mtime_ns
+    cached = previous.get(rel)
+    if cached is not None and cached['mtime'] == mtime:
+        listing = cached['entries']
+    else:
+        listing = _list_dir(path, rel, ignore_dirs, matcher)
+    directories[rel] = {'mtime': mtime, 'entries': listing}
+    for name, kind, _, _, _ in listing:
+        if kind == 'dir':
+            _scan(root, f"{rel}/{name}" if rel else name, ignore_dirs, matcher, previous, directories)
+
+
+def scan(root=DEFAULT_ROOT, ignore_dirs=IGNORE_DIRS, previous=None):
+    """
+    Recorre 'root' con os.scandir y devuelve el índice:
+    {'root', 'version', 'ignore_dirs', 'ignore_fingerprint', 'directories': {rel: {'mtime', 'entries'}}}
+    Si se entrega un índice previo, los directorios sin cambios no se vuelven a listar.
+    """
+    root = os.path.abspath(root)
+    ignore_dirs = sorted(ignore_dirs)
+    matcher = ignore_rules.load_matcher(root)
+    if (
+        not previous
+        or previous.get('root') != root
+        or previous.get('version') != INDEX_VERSION
+        or previous.get('ignore_dirs') != ignore_dirs
+        or previous.get('ignore_fingerprint') != matcher.fingerprint
+    ):
+        previous = {'directories': {}}
+    directories = {}
+    _scan(root, '', set(ignore_dirs), matcher, previous['directories'], directories)
+    return {
+        'root': root,
+        'version': INDEX_VERSION,
+        'ignore_dirs': ignore_dirs,
+        'ignore_fingerprint': matcher.fingerprint,
+        'directories': directories,
+    }
+
+
+def load_index(index_path=INDEX_PATH):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_index(index, index_path=INDEX_PATH):
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def get_index(root=DEFAULT_ROOT, index_path=INDEX_PATH, refresh=False):
+    """
+    Devuelve el índice de 'root', reutilizando el que ya está en memoria
+    (salvo refresh=True) o el guardado en 'index_path'.
+    """
+    key = os.path.abspath(root)
+    if key in _indexes and not refresh:
+        return _indexes[key]
+    previous = _indexes.get(key) or (load_index(index_path) if index_path else None)
+    index = scan(root, previous=previous)
+    if index_path:
+        save_index(index, index_path)
+    _indexes[key] = index
+    return index
+
+
+def iter_entries(index, rel='', depth=0):
+    """Entradas en pre-orden: el directorio, sus archivos y luego sus subdirectorios."""
+    directory = index['directories'][rel]
+    yield Entry(rel, 'dir', 0, directory['mtime'], '', depth, False)
+    subdirs = []
+    for name, kind, size, mtime, binary in directory['entries']:
+        path = f"{rel}/{name}" if rel else name
+        if kind == 'dir':
+            subdirs.append(path)
+        else:
+            yield Entry(path, 'file', size, mtime, os.path.splitext(name)[1], depth + 1, binary)
+    for path in subdirs:
+        yield from iter_entries(index, path, depth + 1)
+
+
+def fresh_entry(root, entry):
+    """
+    'entry' con size, mtime y binary al día según stat, o None si el
+    archivo ya no existe. Solo se vuelve a inspeccionar si cambió.
+    """
+    path = os.path.join(root, *entry.path.split('/'))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime:
+        return entry
+    binary = stat.st_size <= ignore_rules.MAX_FILE_BYTES and ignore_rules.is_binary(path, entry.ext)
+    return entry._replace(size=stat.st_size, mtime=stat.st_mtime_ns, binary=binary)
+
+
+def iter_files(base, extensions=None, root=DEFAULT_ROOT):
+    """
+    Rutas absolutas de los archivos de texto bajo 'base' (se omiten los
+    binarios y los más grandes que MAX_FILE_BYTES). Si 'base' está dentro de
+    'root' se usa el índice compartido; si no, se escanea 'base' por separado.
+    """
+    base = os.path.abspath(base)
+    root = os.path.abspath(root)
+    if base == root or base.startswith(root + os.sep):
+        index = get_index(root)
+        rel = os.path.relpath(base, root).replace(os.sep, '/')
+        rel = '' if rel == '.' else rel
+    else:
+        index = get_index(base, index_path=None)
+        root, rel = base, ''
+    if rel not in index['directories']:
+        return
+    for entry in iter_entries(index, rel):
+        if entry.type != 'file' or (extensions is not None and entry.ext not in extensions):
+            continue
+        entry = fresh_entry(root, entry)
+        if entry is None or entry.binary or entry.size > ignore_rules.MAX_FILE_BYTES:
+            continue
+        yield os.path.join(root, *entry.path.split('/'))
+
+
+def render_tree(index, max_depth=TREE_MAX_DEPTH):
+    structure = []
+    root_name = os.path.basename(index['root'])
+    for entry in iter_entries(index):
+        if entry.type == 'dir':
+            if entry.depth >= max_depth:
+                # No descender más allá de max_depth
+                continue
+            indent = '    ' * entry.depth
+            folder = os.path.basename(entry.path) if entry.path else root_name
+            structure.append(f"{indent}├── {folder}/")
+        elif entry.depth <= max_depth:
+            entry = fresh_entry(index['root'], entry)
+            if entry is None or entry.size > ignore_rules.MAX_FILE_BYTES:
+                continue
+            subindent = '    ' * entry.depth
+            structure.append(f"{subindent}├── {os.path.basename(entry.path)}")
+    return '\n'.join(structure)
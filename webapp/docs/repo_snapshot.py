@@ -0,0 +1,244 @@
+import argparse
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import msgpack
+
+import context_budget
+import repo_scanner
+import repo_to_markdown
+import source_compaction
+
+# Snapshot binario del escaneo del repositorio: una alternativa a repo.md
+# que conserva los metadatos de cada archivo y se puede leer sin parsear
+# texto. Formato:
+#
+#   cabecera   MAGIC (8 bytes) + offset y largo de la tabla (2 x uint64)
+#   blobs      contenido de cada archivo (UTF-8, ya compactado si aplica)
+#   tabla      msgpack: versión, raíz, árbol de directorios, nivel de
+#              compactación y la tabla de archivos (ver FIELDS)
+#
+# Los consumidores abren el snapshot con mmap y solo leen el contenido de
+# los archivos que usan. Con el snapshot se puede renderizar repo.md, armar
+# el contexto de los generadores (build_docs.py build --snapshot) y comparar
+# contra la ejecución anterior sin volver a escanear:
+#
+#   python repo_snapshot.py build              # escanea y muestra qué cambió
+#   python repo_snapshot.py render --output repo.md
+#   python repo_snapshot.py diff anterior.bin .repo_snapshot.bin
+SNAPSHOT_PATH = os.environ.get('DOCS_SNAPSHOT', './.repo_snapshot.bin')
+MAGIC = b'DOCSNAP\x01'
+HEADER = struct.Struct('<8sQQ')
+SNAPSHOT_VERSION = 1
+FIELDS = ('path', 'hash', 'size', 'mtime', 'layer', 'offset', 'length')
+
+FileEntry = namedtuple('FileEntry', FIELDS)
+
+
+def layer(path):
+    """Capa de LAYER_PRIORITY a la que pertenece la ruta, o None."""
+    parts = path.replace('\\', '/').split('/')
+    return next((name for name in context_budget.LAYER_PRIORITY if name in parts), None)
+
+
+class Snapshot:
+    """Snapshot abierto con mmap; el contenido de cada archivo se lee al pedirlo."""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, table_offset, table_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un snapshot del repositorio")
+        table = msgpack.unpackb(self._mmap[table_offset:table_offset + table_length])
+        if table['version'] != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: versión de snapshot {table['version']} no soportada")
+        self.root = table['root']
+        self.tree = table['tree']
+        self.compact = table['compact']
+        self.created = table['created']
+        self.files = {entry[0]: FileEntry(*entry) for entry in table['files']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def __len__(self):
+        return len(self.files)
+
+    def blob(self, path):
+        entry = self.files[path]
+        return self._mmap[entry.offset:entry.offset + entry.length]
+
+    def content(self, path):
+        return self.blob(path).decode('utf-8')
+
+    def fragment(self, path):
+        lenguaje = 'tsx' if path.endswith('.tsx') else 'ts'
+        return repo_to_markdown.renderizar_fragmento(path, lenguaje, self.content(path))
+
+    def iter_fragments(self, paths=None):
+        for path in paths if paths is not None else self.files:
+            yield self.fragment(path)
+
+    def repo(self, paths=None):
+        """repo.md como texto (igual al de repo_to_markdown), opcionalmente solo con 'paths'."""
+        return "\n".join(self.iter_fragments(paths))
+
+    def render(self, output_path=None):
+        repo_to_markdown.escribir_markdown(self.iter_fragments(), output_path)
+
+
+def open_snapshot(path=SNAPSHOT_PATH):
+    """El snapshot de 'path', o None si no existe o no es válido."""
+    try:
+        return Snapshot(path)
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+
+
+def build(path=SNAPSHOT_PATH, root=repo_scanner.DEFAULT_ROOT, rutas=repo_to_markdown.RUTAS, compactar=None, previous=None):
+    """
+    Escanea 'rutas' y escribe el snapshot en 'path' (de forma atómica).
+    Los archivos con el mismo size y mtime que en 'previous' se copian desde
+    ese snapshot sin volver a leerlos. Devuelve (archivos, bytes leídos).
+    """
+    if compactar == 'none':
+        compactar = None
+    reusable = previous if previous is not None and previous.compact == compactar else None
+    index = repo_scanner.get_index(root)
+    files = []
+    leidos = 0
+    tmp_path = path + '.tmp'
+    # 'previous' se cierra siempre; si la escritura falla no queda el .tmp a medias
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            for ruta in rutas:
+                for file_path in repo_scanner.iter_files(os.path.abspath(ruta), repo_to_markdown.EXTENSIONES, root):
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        continue
+                    entry = reusable.files.get(file_path) if reusable else None
+                    if entry and entry.size == stat.st_size and entry.mtime == stat.st_mtime_ns:
+                        data, content_hash = reusable.blob(file_path), entry.hash
+                    else:
+                        try:
+                            with open(file_path, 'rb') as source:
+                                raw = source.read()
+                            content_hash = hashlib.sha256(raw).hexdigest()
+                            contenido = source_compaction.compact(raw.decode('utf-8'), compactar)
+                            leidos += len(raw)
+                        except Exception as e:
+                            content_hash = None
+                            contenido = f"Error al leer el archivo {file_path}: {e}"
+                        data = contenido.encode('utf-8')
+                    files.append((
+                        file_path, content_hash, stat.st_size, stat.st_mtime_ns, layer(file_path), f.tell(), len(data),
+                    ))
+                    f.write(data)
+            table = msgpack.packb({
+                'version': SNAPSHOT_VERSION,
+                'root': os.path.abspath(root),
+                'tree': repo_scanner.render_tree(index),
+                'compact': compactar,
+                'created': time.time(),
+                'files': files,
+            })
+            table_offset = f.tell()
+            f.write(table)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, table_offset, len(table)))
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    finally:
+        if previous is not None:
+            previous.close()
+    os.replace(tmp_path, path)
+    return len(files), leidos
+
+
+def diff(old_files, new_files):
+    """Rutas agregadas, eliminadas y modificadas (por hash) entre dos tablas de archivos."""
+    return {
+        'added': [path for path in new_files if path not in old_files],
+        'removed': [path for path in old_files if path not in new_files],
+        'modified': [
+            path for path, entry in new_files.items()
+            if path in old_files and old_files[path].hash != entry.hash
+        ],
+    }
+
+
+def print_diff(changes, file=sys.stdout):
+    print(
+        f"Cambios: {len(changes['added'])} agregados, {len(changes['modified'])} modificados, "
+        f"{len(changes['removed'])} eliminados",
+        file=file,
+    )
+    for mark, key in (('+', 'added'), ('~', 'modified'), ('-', 'removed')):
+        for path in changes[key]:
+            print(f"  {mark} {path}", file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot binario del escaneo del repositorio')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Escanea el repositorio y escribe el snapshot')
+    build_parser.add_argument('--output', default=SNAPSHOT_PATH)
+    build_parser.add_argument('--compact', choices=source_compaction.LEVELS, help='Compactación del código guardado')
+    render_parser = subparsers.add_parser('render', help='Escribe repo.md desde el snapshot')
+    render_parser.add_argument('--snapshot', default=SNAPSHOT_PATH)
+    render_parser.add_argument('--output', help='Archivo de salida (por defecto se imprime por consola)')
+    diff_parser = subparsers.add_parser('diff', help='Compara dos snapshots')
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new', nargs='?', default=SNAPSHOT_PATH)
+    list_parser = subparsers.add_parser('ls', help='Lista la tabla de archivos')
+    list_parser.add_argument('--snapshot', default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        previous = open_snapshot(args.output)
+        # Solo la tabla del snapshot anterior queda en memoria para comparar
+        previous_files = dict(previous.files) if previous else None
+        archivos, leidos = build(args.output, compactar=args.compact, previous=previous)
+        print(
+            f"Snapshot: {archivos} archivos ({leidos / 2 ** 20:.2f} MB leídos) en "
+            f"{time.perf_counter() - start_time:.2f}s → {os.path.abspath(args.output)}"
+        )
+        if previous_files is not None:
+            with Snapshot(args.output) as snapshot:
+                print_diff(diff(previous_files, snapshot.files))
+    elif args.command == 'render':
+        with Snapshot(args.snapshot) as snapshot:
+            snapshot.render(args.output)
+    elif args.command == 'diff':
+        with Snapshot(args.old) as old, Snapshot(args.new) as new:
+            print_diff(diff(old.files, new.files))
+    else:
+        with Snapshot(args.snapshot) as snapshot:
+            for entry in snapshot.files.values():
+                print(f"{entry.size:>9}  {entry.layer or '-':<15} {(entry.hash or '')[:12]:<12}  {entry.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,64 +1,304 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import json
 import os
+import sys
+import time
 
-def generar_markdown_ts_tsx(rutas):
+import repo_scanner
+import source_compaction
+import tracing
+
+MANIFEST_PATH = './.repo_manifest.json'
+EXTENSIONES = ('.ts', '.tsx')
+BUFFER_SIZE = 64 * 1024
+# Lecturas en vuelo por worker: acota la memoria usada al leer en paralelo
+PENDIENTES_POR_WORKER = 4
+
+# Ajusta o define las rutas que desees recorrer
+RUTAS = [
+    "../src/application",
+    "../src/domain",
+    "../src/infrastructure",
+    "../src/presentation",
+    "../src/providers",
+    "../src/routes",
+    # "/Users/consultor/Development/shopping-app/src/components/foodie",
+    # "/Users/consultor/Development/shopping-app/src/pages/foodie-flow",
+    # "/Users/consultor/Development/shopping-app/src/pages/foodie-orders",
+    # Agrega aquí más rutas si lo deseas
+]
+
+
+def renderizar_fragmento(ruta_completa, lenguaje, contenido):
+    # Construimos el bloque de Markdown
+    return "\n".join([
+        f"## {ruta_completa}",
+        f"```{lenguaje}",
+        contenido,
+        "```",
+        "",  # Línea en blanco opcional
+    ])
+
+
+def cargar_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def guardar_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def leer_contenido(ruta_completa, max_por_archivo=None):
+    with open(ruta_completa, 'r', encoding='utf-8') as f:
+        if max_por_archivo is None:
+            return f.read()
+        contenido = f.read(max_por_archivo + 1)
+    if len(contenido) > max_por_archivo:
+        contenido = contenido[:max_por_archivo] + "\n// ... (archivo truncado)"
+    return contenido
+
+
+def fragmento_archivo(ruta_completa, manifest_anterior, manifest, incremental, max_por_archivo=None, compactar=None):
+    """
+    Devuelve (fragmento, bytes leídos, tokens); 0 bytes si se reutilizó el
+    manifest. Con 'compactar' (nivel de source_compaction) tokens es la tupla
+    (tokens originales, tokens compactados); si no, None.
+    """
+    # Determinar el lenguaje para el bloque de código
+    lenguaje = 'tsx' if ruta_completa.endswith('.tsx') else 'ts'
+
+    entrada = manifest_anterior.get(ruta_completa)
+    stat = None
+    if incremental:
+        try:
+            stat = os.stat(ruta_completa)
+        except OSError:
+            stat = None
+        # Sin cambios de tamaño ni mtime: se reutiliza el fragmento sin leer el archivo
+        if (
+            stat and entrada
+            and entrada['size'] == stat.st_size
+            and entrada['mtime'] == stat.st_mtime_ns
+            and entrada.get('max') == max_por_archivo
+            and entrada.get('compact') == compactar
+        ):
+            manifest[ruta_completa] = entrada
+            return entrada['fragment'], 0, entrada.get('tokens')
+
+    # Leemos el contenido del archivo
+    try:
+        contenido = leer_contenido(ruta_completa, max_por_archivo)
+    except Exception as e:
+        contenido = f"Error al leer el archivo {ruta_completa}: {e}"
+        return renderizar_fragmento(ruta_completa, lenguaje, contenido), 0, None
+
+    leidos = len(contenido.encode('utf-8'))
+    # Si solo cambió el mtime y el hash es el mismo no hace falta re-renderizar
+    content_hash = hashlib.sha256(contenido.encode('utf-8')).hexdigest() if stat else None
+    if stat and entrada and entrada['hash'] == content_hash and entrada.get('compact') == compactar:
+        fragmento, tokens = entrada['fragment'], entrada.get('tokens')
+    else:
+        tokens = None
+        if compactar:
+            compactado = source_compaction.compact(contenido, compactar)
+            tokens = (source_compaction.count_tokens(contenido), source_compaction.count_tokens(compactado))
+            contenido = compactado
+        fragmento = renderizar_fragmento(ruta_completa, lenguaje, contenido)
+    if stat is None:
+        return fragmento, leidos, tokens
+
+    manifest[ruta_completa] = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'hash': content_hash,
+        'max': max_por_archivo,
+        'compact': compactar,
+        'tokens': tokens,
+        'fragment': fragmento,
+    }
+    return fragmento, leidos, tokens
+
+
+def en_orden(rutas_archivos, procesar, workers):
+    """
+    Aplica 'procesar' a cada ruta con un pool de 'workers' hilos, entregando
+    los resultados en el mismo orden de las rutas. Con workers <= 1 se lee
+    en serie.
+    """
+    if workers <= 1:
+        for ruta in rutas_archivos:
+            yield procesar(ruta)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pendientes = deque()
+        for ruta in rutas_archivos:
+            pendientes.append(executor.submit(procesar, ruta))
+            if len(pendientes) >= workers * PENDIENTES_POR_WORKER:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def iterar_markdown_ts_tsx(rutas, manifest_path=None, max_por_archivo=None, max_total=None, workers=1, estadisticas=None,
+                           compactar=None, root=repo_scanner.DEFAULT_ROOT):
+    """
+    Igual que generar_markdown_ts_tsx, pero entrega un fragmento de
+    Markdown por archivo a medida que se leen, sin acumular el documento
+    completo en memoria. 'max_por_archivo' y 'max_total' limitan la
+    cantidad de caracteres por archivo y en total.
+
+    Con workers > 1 los archivos se leen con un pool de hilos (útil en
+    volúmenes de red), manteniendo el orden de salida. Si se entrega el
+    dict 'estadisticas' se completa con archivos y bytes leídos y segundos.
+
+    'compactar' es un nivel de source_compaction.LEVELS; las estadísticas
+    incluyen entonces los tokens antes y después de compactar. 'root' es la
+    raíz del proyecto cuyo índice (y reglas de ignore) se usa.
+    """
+    manifest_anterior = cargar_manifest(manifest_path) if manifest_path else {}
+    manifest = {}
+    if compactar == 'none':
+        compactar = None
+    total = 0
+    completo = False
+    if estadisticas is None:
+        estadisticas = {}
+    estadisticas.update(archivos=0, bytes=0, segundos=0.0, tokens_originales=0, tokens_compactados=0)
+    inicio = time.perf_counter()
+
+    def procesar(ruta_completa):
+        return fragmento_archivo(
+            ruta_completa, manifest_anterior, manifest, bool(manifest_path), max_por_archivo, compactar
+        )
+
+    # Los archivos salen del índice compartido con el árbol de directorios;
+    # normalizamos las rutas en caso de necesitarlo
+    rutas_archivos = (
+        ruta_completa
+        for ruta_base in rutas
+        for ruta_completa in repo_scanner.iter_files(os.path.abspath(ruta_base), EXTENSIONES, root)
+    )
+
+    try:
+        for fragmento, leidos, tokens in en_orden(rutas_archivos, procesar, workers):
+            if leidos:
+                estadisticas['archivos'] += 1
+                estadisticas['bytes'] += leidos
+            if tokens:
+                estadisticas['tokens_originales'] += tokens[0]
+                estadisticas['tokens_compactados'] += tokens[1]
+            total += len(fragmento)
+            if max_total is not None and total > max_total:
+                yield f"<!-- repo.md truncado: se alcanzó el límite de {max_total} caracteres -->\n"
+                return
+            yield fragmento
+        completo = True
+    finally:
+        fin = time.perf_counter()
+        estadisticas['segundos'] = fin - inicio
+        tracing.record('read', inicio, fin, files=estadisticas['archivos'], bytes=estadisticas['bytes'])
+        if manifest_path:
+            if not completo:
+                # Los archivos que no alcanzaron a recorrerse conservan su entrada anterior
+                manifest = {**manifest_anterior, **manifest}
+            # Los archivos eliminados simplemente no se copian al nuevo manifest
+            guardar_manifest(manifest_path, manifest)
+
+
+def generar_markdown_ts_tsx(rutas, manifest_path=None, max_por_archivo=None, max_total=None, workers=1, compactar=None):
     """
     Recorre recursivamente cada una de las rutas en 'rutas', buscando
     archivos con extensión .ts o .tsx. Devuelve un string con el contenido
     en formato Markdown, donde cada archivo se presenta con:
-    
+
     ## <ruta del archivo>
     ```<ts|tsx>
     <contenido del archivo>
     ```
-    """
-    markdown_parts = []
-
-    for ruta_base in rutas:
-        # Normalizamos la ruta en caso de necesitarlo
-        ruta_base = os.path.abspath(ruta_base)
-
-        for root, dirs, files in os.walk(ruta_base):
-            for filename in files:
-                if filename.endswith('.ts') or filename.endswith('.tsx'):
-                    ruta_completa = os.path.join(root, filename)
-                    
-                    # Determinar el lenguaje para el bloque de código
-                    lenguaje = 'tsx' if filename.endswith('.tsx') else 'ts'
-                    
-                    # Leemos el contenido del archivo
-                    try:
-                        with open(ruta_completa, 'r', encoding='utf-8') as f:
-                            contenido = f.read()
-                    except Exception as e:
-                        contenido = f"Error al leer el archivo {ruta_completa}: {e}"
-                    
-                    # Construimos el bloque de Markdown
-                    markdown_parts.append(f"## {ruta_completa}")
-                    markdown_parts.append(f"```{lenguaje}")
-                    markdown_parts.append(contenido)
-                    markdown_parts.append("```")
-                    markdown_parts.append("")  # Línea en blanco opcional
 
+    Si se entrega 'manifest_path' el proceso es incremental: el manifest
+    guarda por archivo (size, mtime, hash) y el fragmento ya renderizado,
+    de modo que solo se leen los archivos nuevos o modificados.
+    """
     # Unimos todos los bloques en un solo string
-    return "\n".join(markdown_parts)
+    return "\n".join(iterar_markdown_ts_tsx(
+        rutas, manifest_path, max_por_archivo, max_total, workers, compactar=compactar
+    ))
+
+
+def escribir_markdown(fragmentos, output_path=None, buffer_size=BUFFER_SIZE):
+    """
+    Escribe los fragmentos a 'output_path' (o a stdout) con un buffer de
+    tamaño fijo, de modo que el uso de memoria no depende del tamaño del
+    repositorio. El archivo se reemplaza de forma atómica al terminar.
+    """
+    if output_path is None:
+        sys.stdout.flush()
+        out = open(sys.stdout.fileno(), 'w', encoding='utf-8', buffering=buffer_size, closefd=False)
+    else:
+        tmp_path = output_path + '.tmp'
+        out = open(tmp_path, 'w', encoding='utf-8', buffering=buffer_size)
+    try:
+        for i, fragmento in enumerate(fragmentos):
+            if i:
+                out.write("\n")
+            out.write(fragmento)
+        out.write("\n")
+    finally:
+        out.close()
+    if output_path is not None:
+        os.replace(tmp_path, output_path)
 
 if __name__ == '__main__':
-    # Ajusta o define las rutas que desees recorrer
-    rutas_a_buscar = [
-        "../src/application",
-        "../src/domain",
-        "../src/infrastructure",
-        "../src/presentation",
-        "../src/providers",
-        "../src/routes",
-        # "/Users/consultor/Development/shopping-app/src/components/foodie",
-        # "/Users/consultor/Development/shopping-app/src/pages/foodie-flow",
-        # "/Users/consultor/Development/shopping-app/src/pages/foodie-orders",
-        # Agrega aquí más rutas si lo deseas
-    ]
-
-    # Generamos todo el Markdown a partir de las rutas definidas
-    markdown_final = generar_markdown_ts_tsx(rutas_a_buscar)
-
-    # Imprimimos por consola (puedes redirigir a un archivo si lo deseas)
-    print(markdown_final)
+    parser = argparse.ArgumentParser(description='Genera repo.md con el código .ts/.tsx del proyecto')
+    parser.add_argument('--incremental', action='store_true', help='Reutiliza los fragmentos de archivos sin cambios')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Ruta del manifest usado en modo incremental')
+    parser.add_argument('--output', help='Archivo de salida (por defecto se imprime por consola)')
+    parser.add_argument('--max-file-chars', type=int, help='Máximo de caracteres por archivo')
+    parser.add_argument('--max-total-chars', type=int, help='Máximo de caracteres de todo el documento')
+    parser.add_argument('--buffer-size', type=int, default=BUFFER_SIZE, help='Tamaño del buffer de escritura')
+    parser.add_argument('--workers', type=int, default=1, help='Hilos para leer archivos en paralelo')
+    parser.add_argument(
+        '--compact', choices=source_compaction.LEVELS, default='none',
+        help='Compacta el código: sin comentarios ni espacios, imports unidos o solo firmas (skeleton)',
+    )
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+
+    # Generamos el Markdown a partir de las rutas definidas y lo escribimos
+    # a medida que se produce (por consola o en --output)
+    estadisticas = {}
+    fragmentos = iterar_markdown_ts_tsx(
+        RUTAS,
+        args.manifest if args.incremental else None,
+        args.max_file_chars,
+        args.max_total_chars,
+        args.workers,
+        estadisticas,
+        args.compact,
+    )
+    escribir_markdown(fragmentos, args.output, args.buffer_size)
+
+    # El rendimiento de lectura va a stderr para no mezclarse con repo.md
+    segundos = estadisticas['segundos'] or 1e-9
+    megabytes = estadisticas['bytes'] / (1024 * 1024)
+    print(
+        f"Lectura: {estadisticas['archivos']} archivos, {megabytes:.2f} MB en {segundos:.2f}s "
+        f"({estadisticas['archivos'] / segundos:.0f} archivos/s, {megabytes / segundos:.2f} MB/s, workers={args.workers})",
+        file=sys.stderr,
+    )
+    if args.compact != 'none':
+        print(source_compaction.reduction_message(
+            estadisticas['tokens_originales'], estadisticas['tokens_compactados'], args.compact
+        ), file=sys.stderr)
+    tracing.finish(args.trace, file=sys.stderr)
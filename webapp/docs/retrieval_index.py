@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import context_budget
+
+# Índice léxico BM25 sobre los archivos de repo.md, para enviar en cada
+# prompt solo los archivos relevantes para la sección que se está
+# escribiendo (p.ej. domain/ports para la sección de puertos) en lugar de
+# repo.md completo. No usa red ni embeddings: los términos salen de los
+# identificadores (separando camelCase y snake_case), la ruta y los
+# comentarios de cada archivo.
+#
+# El índice se guarda en INDEX_PATH junto a repo.md y se actualiza por
+# archivo: solo se re-indexan los fragmentos cuyo hash cambió.
+#
+#   python retrieval_index.py "puertos del dominio" --top-k 5
+INDEX_PATH = os.environ.get('DOCS_RETRIEVAL_INDEX', './.repo_bm25.json')
+INDEX_VERSION = 1
+TOP_K = int(os.environ.get('DOCS_RETRIEVAL_TOP_K', 8))
+TOKEN_BUDGET = int(os.environ.get('DOCS_RETRIEVAL_TOKENS', 6000))
+# Parámetros estándar de BM25
+K1 = 1.2
+B = 0.75
+# Los términos de la ruta pesan más que los del contenido
+PATH_WEIGHT = 3
+
+IDENTIFIER = re.compile(r'[A-Za-zÀ-ÿ_$][\wÀ-ÿ$]*')
+CAMEL_CASE = re.compile(r'[A-ZÀ-Ý]+(?=[A-ZÀ-Ý][a-zà-ÿ])|[A-ZÀ-Ý]?[a-zà-ÿ]+|[A-ZÀ-Ý]+|\d+')
+STOPWORDS = {
+    # TypeScript / JSX
+    'import', 'from', 'export', 'default', 'const', 'let', 'var', 'function', 'return', 'if', 'else',
+    'new', 'this', 'true', 'false', 'null', 'undefined', 'async', 'await', 'type', 'interface',
+    'string', 'number', 'boolean', 'void', 'any', 'unknown', 'as', 'of', 'in', 'for', 'class',
+    'extends', 'implements', 'ts', 'tsx', 'div', 'span', 'name', 'props', 'react', 'src',
+    # Español / inglés frecuentes en los títulos del template
+    'el', 'la', 'los', 'las', 'de', 'del', 'en', 'y', 'o', 'un', 'una', 'con', 'para', 'por', 'que',
+    'se', 'su', 'sus', 'al', 'es', 'the', 'and', 'or', 'to', 'is', 'a',
+}
+
+
+def terms(text):
+    """Términos en minúsculas: identificadores separados por camelCase y '_'."""
+    result = []
+    for identifier in IDENTIFIER.findall(text):
+        for part in identifier.replace('$', '_').split('_'):
+            for word in CAMEL_CASE.findall(part) or [part]:
+                word = word.lower()
+                if len(word) > 1 and word not in STOPWORDS:
+                    result.append(word)
+    return result
+
+
+def fragment_terms(fragment):
+    path = context_budget.fragment_path(fragment)
+    return terms(path) * PATH_WEIGHT + terms(fragment.split('\n', 1)[1] if '\n' in fragment else '')
+
+
+def fragment_hash(fragment):
+    return hashlib.sha256(fragment.encode('utf-8')).hexdigest()
+
+
+def build(repo, previous=None):
+    """
+    Indexa cada fragmento de repo.md. Devuelve
+    {'version', 'documents': {ruta: {'hash', 'length', 'tf': {término: frecuencia}}}}
+    reutilizando las entradas de 'previous' cuyo hash no cambió.
+    """
+    cached = (previous or {}).get('documents', {}) if (previous or {}).get('version') == INDEX_VERSION else {}
+    documents = {}
+    for fragment in context_budget.split_fragments(repo):
+        path = context_budget.fragment_path(fragment)
+        digest = fragment_hash(fragment)
+        if path in cached and cached[path]['hash'] == digest:
+            documents[path] = cached[path]
+            continue
+        counts = Counter(fragment_terms(fragment))
+        documents[path] = {'hash': digest, 'length': sum(counts.values()), 'tf': dict(counts)}
+    return {'version': INDEX_VERSION, 'documents': documents}
+
+
+def load(index_path=INDEX_PATH):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save(index, index_path=INDEX_PATH):
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def get_index(repo, index_path=INDEX_PATH):
+    """Índice de 'repo', actualizado incrementalmente desde el guardado en 'index_path'."""
+    previous = load(index_path) if index_path else None
+    index = build(repo, previous)
+    if index_path and index != previous:
+        save(index, index_path)
+    return index
+
+
+def search(index, query, top_k=TOP_K):
+    """Las 'top_k' rutas con mayor puntaje BM25 para 'query', como [(ruta, puntaje)]."""
+    documents = index['documents']
+    if not documents:
+        return []
+    query_terms = set(terms(query))
+    average_length = sum(document['length'] for document in documents.values()) / len(documents) or 1
+    frequency = {
+        term: sum(1 for document in documents.values() if term in document['tf'])
+        for term in query_terms
+    }
+    scores = []
+    for path, document in documents.items():
+        score = 0.0
+        for term in query_terms:
+            tf = document['tf'].get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+            score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * document['length'] / average_length))
+        if score > 0:
+            scores.append((path, score))
+    scores.sort(key=lambda item: (-item[1], item[0]))
+    return scores[:top_k]
+
+
+def relevant_code(repo, query, index=None, top_k=TOP_K, max_tokens=TOKEN_BUDGET, model=None):
+    """
+    Fragmentos de repo.md más relevantes para 'query' que caben en
+    'max_tokens', en el orden original de repo.md.
+    """
+    index = index or get_index(repo)
+    fragments = {context_budget.fragment_path(fragment): fragment for fragment in context_budget.split_fragments(repo)}
+    encoding = context_budget.get_encoding(model or 'gpt-4o')
+    selected = []
+    budget = max_tokens
+    for path, _ in search(index, query, top_k):
+        cost = context_budget.count_tokens(fragments[path], encoding)
+        if cost <= budget:
+            selected.append(path)
+            budget -= cost
+    order = list(fragments)
+    return '\n'.join(fragments[path].rstrip('\n') + '\n' for path in sorted(selected, key=order.index))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Busca en repo.md los archivos más relevantes para una consulta')
+    parser.add_argument('query')
+    parser.add_argument('--repo', default='./repo.md')
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    with open(args.repo, 'r', encoding='utf-8') as f:
+        repo = f.read()
+    for path, score in search(get_index(repo), args.query, args.top_k):
+        print(f"{score:7.2f}  {path}")
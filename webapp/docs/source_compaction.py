@@ -0,0 +1,251 @@
+import argparse
+import re
+
+import context_budget
+import repo_scanner
+
+# Compactación del código TS/TSX que va a repo.md, para gastar menos tokens
+# de prompt. Los niveles son acumulativos:
+#   none        el archivo tal cual
+#   whitespace  sin comentarios, líneas en blanco ni espacios al final
+#   imports     además, los imports del mismo módulo se unen en una sola línea
+#   skeleton    además, se omiten los cuerpos de funciones, métodos y
+#               componentes: quedan exports, tipos, interfaces, firmas y props
+#
+#   python source_compaction.py ../src     # reducción de tokens por nivel
+LEVELS = ('none', 'whitespace', 'imports', 'skeleton')
+ELIDED = '…'
+# Modelo con el que se cuentan los tokens de los reportes
+TOKEN_MODEL = 'qwen-2.5-coder-32b'
+
+IMPORT_STATEMENT = re.compile(
+    r'''(?m)^import[ \t]+(type[ \t]+)?(?:([^'";]+?)[ \t]+from[ \t]+)?(['"])([^'"\n]+)\3[ \t]*;?[ \t]*$'''
+)
+NAMED_IMPORTS = re.compile(r'^(?:([\w$]+)\s*,\s*)?\{([^}]*)\}$', re.DOTALL)
+TYPE_DECLARATION = re.compile(r'^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:type|interface|enum)\b')
+# Lo que precede a un bloque que es cuerpo de función: '=>' o ')' con tipo de retorno opcional
+FUNCTION_BODY_PREFIX = re.compile(r'(?:=>|\)(?:\s*:[^;=]*?)?)\s*$')
+
+_encoding = None
+
+
+def _skip_string(code, i):
+    """Índice siguiente al literal de cadena que empieza en code[i]."""
+    quote = code[i]
+    i += 1
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        # Las comillas simples y dobles no cruzan líneas: si no cierran (texto
+        # JSX con apóstrofos, p.ej.) se corta ahí para no arrastrar el error
+        if c == '\n' and quote != '`':
+            return i
+        i += 1
+    return n
+
+
+def _comment_end(code, i):
+    """Si en code[i] empieza un comentario, índice donde termina; si no, None."""
+    if code.startswith('//', i):
+        end = code.find('\n', i)
+        return len(code) if end == -1 else end
+    if code.startswith('/*', i):
+        end = code.find('*/', i + 2)
+        return len(code) if end == -1 else end + 2
+    return None
+
+
+def strip_comments(code):
+    out = []
+    i = start = 0
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c in '\'"`':
+            i = _skip_string(code, i)
+            continue
+        if c == '/':
+            end = _comment_end(code, i)
+            # 'http://' dentro de texto JSX no es un comentario
+            if end is not None and not (code.startswith('//', i) and i and code[i - 1] == ':'):
+                out.append(code[start:i])
+                i = start = end
+                continue
+        i += 1
+    out.append(code[start:])
+    return ''.join(out)
+
+
+def strip_whitespace(code):
+    lines = (line.rstrip() for line in strip_comments(code).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def _merge_imports(matches):
+    """Une los imports de un mismo módulo: default, namespace y nombres sin repetir."""
+    type_only, module, quote = matches[0].group(1), matches[0].group(4), matches[0].group(3)
+    defaults, namespaces, names = [], [], []
+    for match in matches:
+        clause = (match.group(2) or '').strip()
+        if not clause:
+            continue
+        named = NAMED_IMPORTS.match(clause)
+        if named:
+            if named.group(1) and named.group(1) not in defaults:
+                defaults.append(named.group(1))
+            for name in named.group(2).split(','):
+                name = ' '.join(name.split())
+                if name and name not in names:
+                    names.append(name)
+        elif clause.startswith('*') or ',' in clause:
+            if clause not in namespaces:
+                namespaces.append(clause)
+        elif clause not in defaults:
+            defaults.append(clause)
+    prefix = f"import {type_only or ''}"
+    source = f"{quote}{module}{quote};"
+    lines = [f"{prefix}{clause} from {source}" for clause in namespaces]
+    if len(defaults) > 1:
+        lines += [f"{prefix}{clause} from {source}" for clause in defaults[1:]]
+    head = ', '.join(([defaults[0]] if defaults else []) + ([f"{{ {', '.join(names)} }}"] if names else []))
+    if head:
+        lines.insert(0, f"{prefix}{head} from {source}")
+    if not lines:
+        lines = [f"import {source}"]
+    return '\n'.join(lines)
+
+
+def dedupe_imports(code):
+    """Une los imports repetidos de un módulo en el lugar del primero."""
+    groups = {}
+    for match in IMPORT_STATEMENT.finditer(code):
+        groups.setdefault((bool(match.group(1)), match.group(4)), []).append(match)
+    if not groups:
+        return code
+    replacements = {}
+    for matches in groups.values():
+        replacements[matches[0].start()] = (matches[0].end(), _merge_imports(matches))
+        for match in matches[1:]:
+            replacements[match.start()] = (match.end(), '')
+    out = []
+    position = 0
+    for start in sorted(replacements):
+        end, text = replacements[start]
+        out.append(code[position:start])
+        out.append(text)
+        position = end
+    out.append(code[position:])
+    return '\n'.join(line for line in ''.join(out).split('\n') if line.strip())
+
+
+def _matching(code, i):
+    """Índice siguiente al cierre del '{' o '(' que está en code[i]."""
+    pairs = {'{': '}', '(': ')', '[': ']'}
+    stack = [pairs[code[i]]]
+    i += 1
+    n = len(code)
+    while i < n and stack:
+        c = code[i]
+        if c in '\'"`':
+            i = _skip_string(code, i)
+            continue
+        if c in pairs:
+            stack.append(pairs[c])
+        elif stack and c == stack[-1]:
+            stack.pop()
+        i += 1
+    return i
+
+
+def skeleton(code):
+    """
+    Omite los cuerpos de funciones, métodos y componentes (bloques que siguen
+    a '=>' o a ')' con tipo de retorno opcional, y el JSX de '=> (...)').
+    Las declaraciones type/interface/enum se conservan completas.
+    """
+    out = []
+    i = start = statement = 0
+    # Por cada '{' abierto: si pertenece a una declaración de tipos
+    in_type = []
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c in '\'"`':
+            i = _skip_string(code, i)
+            continue
+        if c in '{(':
+            before = code[statement:i]
+            typed = bool(in_type and in_type[-1]) or (not in_type and bool(TYPE_DECLARATION.match(before.lstrip())))
+            if not typed and (
+                (c == '{' and FUNCTION_BODY_PREFIX.search(before) and before.rstrip()[-1:] not in '<|&,')
+                or (c == '(' and before.rstrip().endswith('=>'))
+            ):
+                end = _matching(code, i)
+                if c == '{' and code[end:].lstrip().startswith('{'):
+                    # Era el tipo de retorno ('): { ... } {'); el cuerpo es el bloque siguiente
+                    i = end
+                    continue
+                out.append(code[start:i])
+                out.append('{ ' + ELIDED + ' }' if c == '{' else '(' + ELIDED + ')')
+                i = start = statement = end
+                continue
+            if c == '{':
+                in_type.append(typed)
+                statement = i + 1
+        elif c == '}':
+            if in_type:
+                in_type.pop()
+            statement = i + 1
+        elif c == ';' or (c == '\n' and not in_type):
+            statement = i + 1
+        i += 1
+    out.append(code[start:])
+    return ''.join(out)
+
+
+def compact(code, level):
+    """Aplica el nivel de compactación 'level' (ver LEVELS) al código."""
+    if level in (None, 'none'):
+        return code
+    if level not in LEVELS:
+        raise ValueError(f"Nivel de compactación desconocido: {level}")
+    code = strip_whitespace(code)
+    if level in ('imports', 'skeleton'):
+        code = dedupe_imports(code)
+    if level == 'skeleton':
+        code = skeleton(code)
+    return code
+
+
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        _encoding = context_budget.get_encoding(TOKEN_MODEL)
+    return context_budget.count_tokens(text, _encoding)
+
+
+def reduction_message(original_tokens, compacted_tokens, level):
+    saved = original_tokens - compacted_tokens
+    share = saved / original_tokens if original_tokens else 0
+    return f"Compactación '{level}': {original_tokens} → {compacted_tokens} tokens (-{saved}, -{share:.1%})"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reducción de tokens de cada nivel de compactación')
+    parser.add_argument('paths', nargs='+', help='Carpetas con código .ts/.tsx')
+    args = parser.parse_args()
+
+    totals = dict.fromkeys(LEVELS, 0)
+    for base in args.paths:
+        for path in repo_scanner.iter_files(base, ('.ts', '.tsx')):
+            with open(path, 'r', encoding='utf-8') as f:
+                code = f.read()
+            for level in LEVELS:
+                totals[level] += count_tokens(compact(code, level))
+    for level in LEVELS[1:]:
+        print(reduction_message(totals['none'], totals[level], level))
@@ -0,0 +1,265 @@
+import os
+
+import doc_validation
+import llm_cache
+import llm_stream
+
+# Validación estructural del documento mientras se genera en streaming
+# (--stream). El texto recibido se compara línea a línea con los
+# encabezados del template (Template.md, README.template.md o el de la
+# guía):
+#
+#   - cuando aparece el último encabezado esperado y luego un encabezado
+#     que no está en el template (o el final se alarga demasiado), el
+#     documento está completo: se corta el stream y no se pagan los tokens
+#     que sobran;
+#   - si un encabezado se repite, llega fuera de orden o una misma línea se
+#     repite varias veces, se corta el stream, se conservan las secciones
+#     completas y se vuelve a pedir solo la sección afectada; después se
+#     pide el resto del documento a partir de la sección siguiente.
+#
+# Las solicitudes de reintento y de continuación agregan el texto ya
+# aceptado como respuesta del asistente a los mensajes originales, de modo
+# que comparten el prefijo (y la caché de prompts) con la primera.
+MAX_SECTION_RETRIES = int(os.environ.get('DOCS_STREAM_SECTION_RETRIES', 2))
+# Una línea (fuera de bloques de código) repetida estas veces es una deriva
+REPEATED_LINE_LIMIT = 3
+MIN_REPEATED_LINE = 40
+
+RETRY_PROMPT = """La respuesta anterior se cortó: {reason}.
+Escribe únicamente esta sección del template, con su encabezado y sin repetir lo ya escrito:
+```
+{section}
+```
+"""
+
+CONTINUE_PROMPT = """Continúa el documento desde esta parte del template, sin repetir lo ya escrito:
+```
+{template}
+```
+"""
+
+
+def section_level(template):
+    """Nivel de encabezado que divide el template en secciones: el menor que se repite."""
+    levels = [level for level, _ in doc_validation.headings(template) if level > 1]
+    repeated = [level for level in set(levels) if levels.count(level) > 1]
+    return min(repeated or levels or [2])
+
+
+def template_sections(template):
+    """
+    Divide el template en secciones por los encabezados de section_level
+    (el preámbulo, si lo hay, es la primera). Devuelve [(texto, [(nivel,
+    encabezado normalizado)])] con los encabezados esperados de cada una.
+    """
+    level = section_level(template)
+    sections = [[]]
+    for line, in_code in doc_validation.iter_lines(template):
+        match = None if in_code else doc_validation.HEADING.match(line)
+        if match and 1 < len(match.group(1)) <= level and any(sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    result = []
+    for lines in sections:
+        text = '\n'.join(lines).strip('\n')
+        expected = [heading for heading in doc_validation.headings(text) if heading[0] > 1]
+        if text:
+            result.append((text, expected))
+    return result
+
+
+class StructureTracker:
+    """
+    Sigue el texto de una solicitud contra los encabezados esperados de un
+    rango de secciones del template. feed() devuelve True cuando hay que
+    cortar el stream: 'status' queda en 'closed' (documento completo) o
+    'aborted' (deriva en la sección 'offending', relativa al rango).
+    """
+
+    def __init__(self, sections, level, strict=True):
+        self.level = level
+        self.strict = strict
+        self.expected = [
+            (heading_level, text, index, position == 0)
+            for index, (_, headings) in enumerate(sections)
+            for position, (heading_level, text) in enumerate(headings)
+        ]
+        # Lo que puede ocupar la última sección antes de considerarla una divagación
+        last_section = sections[-1][0] if sections else ''
+        self.max_tail = max(int(len(last_section) * doc_validation.MAX_LENGTH_RATIO), doc_validation.MIN_MAX_LENGTH)
+        self.position = 0
+        self.section = 0
+        self.boundaries = {0: 0}
+        self.tail_start = 0
+        self.lines = {}
+        self.in_code = False
+        self.text = ''
+        self.offset = 0
+        self.status = 'ended'
+        self.reason = None
+        self.offending = None
+        self.cut = None
+
+    @property
+    def content(self):
+        """Texto aceptado: hasta el corte si lo hubo."""
+        return self.text if self.cut is None else self.text[:self.cut]
+
+    def feed(self, delta):
+        self.text += delta
+        while self.cut is None:
+            end = self.text.find('\n', self.offset)
+            if end < 0:
+                return False
+            self._line(self.text[self.offset:end], self.offset)
+            self.offset = end + 1
+        return True
+
+    def finish(self):
+        """Procesa la última línea (sin salto de línea final) cuando termina el stream."""
+        if self.cut is None and self.offset < len(self.text):
+            self._line(self.text[self.offset:], self.offset)
+
+    def _close(self, offset):
+        self.status = 'closed'
+        self.cut = offset
+
+    def _abort(self, reason, offending, offset):
+        self.status = 'aborted'
+        self.reason = reason
+        self.offending = offending
+        self.cut = offset
+
+    def _line(self, line, offset):
+        if doc_validation.FENCE.match(line):
+            self.in_code = not self.in_code
+            return
+        if self.in_code:
+            return
+        match = doc_validation.HEADING.match(line)
+        if match:
+            self._heading(len(match.group(1)), doc_validation.normalize_heading(match.group(2)), offset)
+            return
+
+        done = self.position == len(self.expected)
+        if done and offset - self.tail_start > self.max_tail and not line.strip():
+            # El final ya se alargó más de lo razonable: se corta en un párrafo
+            self._close(offset)
+            return
+        key = line.strip()
+        if self.strict and len(key) >= MIN_REPEATED_LINE:
+            self.lines[key] = self.lines.get(key, 0) + 1
+            if self.lines[key] >= REPEATED_LINE_LIMIT:
+                self._abort(f"línea repetida {REPEATED_LINE_LIMIT} veces ({key[:40]!r}...)", self.section,
+                            self.boundaries[self.section])
+
+    def _heading(self, level, text, offset):
+        if self.position < len(self.expected) and text == self.expected[self.position][1]:
+            _, _, index, is_head = self.expected[self.position]
+            if is_head:
+                # La primera sección conserva lo escrito antes de su encabezado (el título)
+                self.boundaries.setdefault(index, offset)
+            self.section = index
+            self.position += 1
+            self.tail_start = offset
+            return
+
+        known = [i for i, (_, expected_text, _, _) in enumerate(self.expected) if expected_text == text]
+        if not known:
+            # Encabezado que no está en el template: después del último esperado, el documento terminó
+            if self.position == len(self.expected) and level <= self.level:
+                self._close(offset)
+            return
+        if not self.strict:
+            return
+        reason = 'encabezado fuera de orden' if any(i > self.position for i in known) else 'encabezado repetido'
+        if self.position == len(self.expected):
+            self._abort(f"{reason} ({text!r})", self.section, self.boundaries[self.section])
+            return
+        _, _, index, is_head = self.expected[self.position]
+        # Si falta el encabezado de la sección siguiente, la actual está completa
+        self._abort(f"{reason} ({text!r})", index, offset if is_head else self.boundaries[self.section])
+
+
+def retry_messages(messages, accepted, section, reason):
+    return _followup(messages, accepted, RETRY_PROMPT.format(reason=reason, section=section))
+
+
+def continue_messages(messages, accepted, template):
+    return _followup(messages, accepted, CONTINUE_PROMPT.format(template=template))
+
+
+def _followup(messages, accepted, prompt):
+    followup = list(messages)
+    if accepted.strip():
+        followup.append({"role": "assistant", "content": accepted})
+    followup.append({"role": "user", "content": prompt})
+    return followup
+
+
+def _join(accepted, content):
+    if not accepted:
+        return content
+    return accepted.rstrip('\n') + '\n\n' + content.lstrip('\n')
+
+
+def validated_stream_completion(client, messages, model, output_path, template, max_tokens=None):
+    """
+    Como llm_stream.stream_completion, pero validando la estructura contra
+    'template' mientras llegan los tokens (ver el comentario del módulo).
+    El documento final se guarda en llm_cache con la clave de la solicitud
+    original.
+    """
+    key = llm_cache.cache_key(model, messages, max_tokens)
+    content = llm_cache.lookup(key)
+    if content is not None:
+        llm_stream.write_atomic(output_path, content)
+        return content
+
+    sections = template_sections(template)
+    level = section_level(template)
+    accepted = ''
+    start, end = 0, len(sections)
+    request = messages
+    retries = 0
+    with llm_stream.partial_file(output_path) as f:
+        while True:
+            tracker = StructureTracker(sections[start:end], level, strict=retries < MAX_SECTION_RETRIES)
+            separator = '\n\n' if accepted else ''
+            f.write(separator)
+            deltas = llm_stream.stream_deltas(client, request, model, max_tokens)
+            try:
+                for delta in deltas:
+                    f.write(delta)
+                    f.flush()
+                    if tracker.feed(delta):
+                        break
+                else:
+                    tracker.finish()
+            finally:
+                deltas.close()
+
+            if tracker.status == 'aborted':
+                offending = start + tracker.offending
+                accepted = _join(accepted, tracker.content) if tracker.content.strip() else accepted
+                retries += 1
+                print(f"Estructura: {tracker.reason}; se vuelve a pedir la sección {offending + 1} de {len(sections)}")
+                start, end = offending, offending + 1
+                request = retry_messages(messages, accepted, sections[offending][0], tracker.reason)
+            else:
+                if tracker.status == 'closed':
+                    print(f"Estructura: documento completo, se corta el stream ({len(tracker.text) - tracker.cut} caracteres descartados)")
+                accepted = _join(accepted, tracker.content)
+                start, end = end, len(sections)
+                request = continue_messages(messages, accepted, '\n\n'.join(text for text, _ in sections[start:]))
+            # El archivo parcial refleja siempre el texto aceptado
+            f.seek(0)
+            f.truncate()
+            f.write(accepted)
+            f.flush()
+            if start >= len(sections):
+                break
+
+    llm_cache.put(key, model, accepted)
+    return accepted
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Trazas livianas del pipeline de documentación. Cada etapa se envuelve en
+# un span con nombre (scan, read, render, tokens, queue, request, ttft,
+# generation, write) y atributos como tokens o bytes:
+#
+#   with tracing.span('read', path=repo_path) as span:
+#       ...
+#       span.set(bytes=size)
+#
+# Al terminar se imprime una línea de resumen y, con --trace PATH (o
+# DOCS_TRACE=PATH), se exporta la traza en formato Chrome trace-event, que se
+# puede abrir en chrome://tracing o en https://ui.perfetto.dev. Los spans de
+# un mismo hilo o tarea asyncio quedan anidados en la misma fila.
+TRACE_PATH = os.environ.get('DOCS_TRACE')
+# Orden de las etapas en el resumen; las demás van al final
+STAGES = ('scan', 'render', 'read', 'tokens', 'queue', 'request', 'ttft', 'generation', 'write')
+
+_origin = time.perf_counter()
+_events = []
+_lanes = {}
+_lane_names = {}
+_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        self.args.update({key: value for key, value in args.items() if value is not None})
+
+
+def _lane():
+    """Fila de la traza: una por hilo y, dentro de un event loop, una por tarea."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    key = (threading.get_ident(), id(task) if task else None)
+    with _lock:
+        if key not in _lanes:
+            _lanes[key] = len(_lanes) + 1
+            _lane_names[_lanes[key]] = task.get_name() if task else threading.current_thread().name
+        return _lanes[key]
+
+
+def record(name, start, end, **args):
+    """Registra un span ya medido (tiempos de time.perf_counter())."""
+    event = {'name': name, 'start': start, 'end': end, 'lane': _lane(), 'args': args}
+    with _lock:
+        _events.append(event)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    current = Span(name, {key: value for key, value in args.items() if value is not None})
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        record(name, start, time.perf_counter(), **current.args)
+
+
+def usage_args(usage):
+    """Atributos de tokens a partir del 'usage' de una respuesta de la API."""
+    if usage is None:
+        return {}
+    # Tokens del prompt servidos desde la caché de prefijos del proveedor:
+    # OpenAI y Groq los informan en prompt_tokens_details, DeepSeek en
+    # prompt_cache_hit_tokens
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', None) if details is not None else None
+    if cached_tokens is None:
+        cached_tokens = getattr(usage, 'prompt_cache_hit_tokens', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+        'completion_tokens': getattr(usage, 'completion_tokens', None),
+        'cached_tokens': cached_tokens,
+    }
+
+
+def events():
+    with _lock:
+        return list(_events)
+
+
+def export(path):
+    trace_events = [
+        {
+            'name': event['name'], 'cat': 'docs', 'ph': 'X', 'pid': os.getpid(), 'tid': event['lane'],
+            'ts': (event['start'] - _origin) * 1e6, 'dur': (event['end'] - event['start']) * 1e6,
+            'args': event['args'],
+        }
+        for event in events()
+    ]
+    trace_events += [
+        {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': lane, 'args': {'name': name}}
+        for lane, name in sorted(_lane_names.items())
+    ]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def summary():
+    """Una línea con el tiempo total, el tiempo acumulado por etapa, los tokens y los bytes."""
+    recorded = events()
+    if not recorded:
+        return 'Traza: sin spans registrados'
+    totals = {}
+    prompt_tokens = cached_tokens = completion_tokens = size = 0
+    for event in recorded:
+        totals[event['name']] = totals.get(event['name'], 0) + event['end'] - event['start']
+        prompt_tokens += event['args'].get('prompt_tokens') or 0
+        cached_tokens += event['args'].get('cached_tokens') or 0
+        completion_tokens += event['args'].get('completion_tokens') or 0
+        size += event['args'].get('bytes') or 0
+    wall = max(event['end'] for event in recorded) - min(event['start'] for event in recorded)
+    names = [name for name in STAGES if name in totals] + sorted(set(totals) - set(STAGES))
+    stages = ' | '.join(f"{name} {totals[name]:.2f}s" for name in names)
+    # Con --cascade, cuántos documentos o secciones terminaron en el modelo grande
+    cascades = [event for event in recorded if event['name'] == 'cascade']
+    if cascades:
+        escalated = sum(1 for event in cascades if event['args'].get('escalated'))
+        stages += f" | cascada {escalated}/{len(cascades)} escaladas"
+    return (
+        f"Traza: {wall:.2f}s | {stages} | tokens {prompt_tokens} entrada"
+        f" ({cached_tokens} en caché) / {completion_tokens} salida"
+        f" | {size / 2 ** 20:.1f} MB"
+    )
+
+
+def finish(path=None, file=sys.stdout):
+    """Imprime el resumen y, si hay ruta, exporta la traza."""
+    print(summary(), file=file)
+    path = path or TRACE_PATH
+    if path:
+        export(path)
+        print(f"Traza guardada en {os.path.abspath(path)}", file=file)
+
+
+def add_arguments(parser):
+    parser.add_argument('--trace', default=TRACE_PATH, help='Exporta la traza (formato Chrome trace-event) a este archivo')